@@ -77,7 +77,7 @@ from helpers import (
     get_available_fields,
     get_all_users_odoo
 )
-from gmail_integration import get_gmail_service, fetch_recent_emails
+from gmail_integration import get_gmail_service, iter_recent_emails
 from azure_llm import analyze_email
 from designer_selector import (
     load_designers,
@@ -85,7 +85,8 @@ from designer_selector import (
     suggest_best_designer_available,
     filter_designers_by_availability,
     rank_designers_by_skill_match,
-    suggest_reshuffling
+    suggest_reshuffling,
+    invalidate_schedule
 )
 
 from prezlab_ui import inject_custom_css, header, container, message, progress_steps, scribble, add_logo
@@ -112,6 +113,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Session-state and auth debug panels render only when DEBUG_AUTH is set in secrets
+DEBUG_AUTH = str(get_secret("DEBUG_AUTH", "False")).lower() == "true"
+
 
 # At the top of app.py, after imports
 def get_odoo_credentials():
@@ -2190,6 +2194,7 @@ def finalize_adhoc_subtasks():
                 if placeholder_employee_id and slot_start and slot_end:
                     planning_task_name = subtask_name
                     create_task(models, uid, placeholder_employee_id, planning_task_name, slot_start, slot_end, parent_task_id=parent_task_id, task_id=subtask_id)
+                    invalidate_schedule(uid, placeholder_employee_id)
                 # --- END NEW ---
             else:
                 create_notification(f"Failed to create subtask {i+1} in Odoo.", "error")
@@ -3233,17 +3238,22 @@ def email_analysis_page():
                 gmail_service = get_gmail_service()
                 
                 if gmail_service:
-                    with st.spinner(f"Fetching up to {email_limit} emails..."):
-                        recent_emails = fetch_recent_emails(gmail_service, total_emails=email_limit, query=search_query)
-                        
-                        if show_threads:
-                            from gmail_integration import extract_email_threads
-                            threads = extract_email_threads(recent_emails)
-                            st.session_state.email_threads = threads
-                        
-                        st.session_state.recent_emails = recent_emails
-                        st.session_state.show_threads = show_threads
-                        st.rerun()  # Refresh to show results
+                    # Show progress as each batch of emails arrives instead of a bare spinner
+                    progress = st.progress(0.0, text=f"Fetching up to {email_limit} emails...")
+                    recent_emails = []
+                    for email in iter_recent_emails(gmail_service, total_emails=email_limit, query=search_query):
+                        recent_emails.append(email)
+                        progress.progress(min(len(recent_emails) / email_limit, 1.0),
+                                          text=f"Fetched {len(recent_emails)} of up to {email_limit} emails...")
+                    
+                    if show_threads:
+                        from gmail_integration import extract_email_threads
+                        threads = extract_email_threads(recent_emails)
+                        st.session_state.email_threads = threads
+                    
+                    st.session_state.recent_emails = recent_emails
+                    st.session_state.show_threads = show_threads
+                    st.rerun()  # Refresh to show results
                 else:
                     create_notification("Failed to connect to Gmail. Please check your credentials.", "error")
             except Exception as e:
@@ -3502,10 +3512,11 @@ def email_analysis_page():
     if "email_analysis" in st.session_state and not st.session_state.get("email_analysis_skipped", True):
         analysis_results = st.session_state.email_analysis
         # DEBUG: Show session state for troubleshooting
-        st.markdown("---")
-        st.markdown("### Debug: Session State Snapshot")
-        st.write(dict(st.session_state))
-        st.markdown("---")
+        if DEBUG_AUTH:
+            st.markdown("---")
+            st.markdown("### Debug: Session State Snapshot")
+            st.write(dict(st.session_state))
+            st.markdown("---")
         # New: Show a confirmation/preview form for AI suggestions
         if "email_analysis_confirmed" not in st.session_state:
             with st.form("ai_suggestion_confirmation_form"):
@@ -3576,26 +3587,27 @@ def google_auth_page():
     drive_auth_complete = st.session_state.get("drive_auth_complete", False)
     
     # Add debug info to help troubleshoot
-    with st.sidebar.expander("Debug Info", expanded=False):
-        st.write("Session State Keys:", list(st.session_state.keys()))
-        st.write("Gmail Creds:", gmail_authenticated)
-        st.write("Drive Creds:", drive_authenticated)
-        st.write("Gmail Auth Complete Flag:", gmail_auth_complete)
-        st.write("Drive Auth Complete Flag:", drive_auth_complete)
-        
-        # Add a reset button
-        if st.button("Reset Google Auth Status (Debug)"):
-            keys_to_remove = [
-                'google_auth_complete', 
-                'google_gmail_creds', 
-                'google_drive_creds',
-                'gmail_auth_complete', 
-                'drive_auth_complete'
-            ]
-            for key in keys_to_remove:
-                if key in st.session_state:
-                    st.session_state.pop(key, None)
-            st.rerun()
+    if DEBUG_AUTH:
+        with st.sidebar.expander("Debug Info", expanded=False):
+            st.write("Session State Keys:", list(st.session_state.keys()))
+            st.write("Gmail Creds:", gmail_authenticated)
+            st.write("Drive Creds:", drive_authenticated)
+            st.write("Gmail Auth Complete Flag:", gmail_auth_complete)
+            st.write("Drive Auth Complete Flag:", drive_auth_complete)
+            
+            # Add a reset button
+            if st.button("Reset Google Auth Status (Debug)"):
+                keys_to_remove = [
+                    'google_auth_complete', 
+                    'google_gmail_creds', 
+                    'google_drive_creds',
+                    'gmail_auth_complete', 
+                    'drive_auth_complete'
+                ]
+                for key in keys_to_remove:
+                    if key in st.session_state:
+                        st.session_state.pop(key, None)
+                st.rerun()
     
     create_notification("Please authenticate with Google to enable Gmail and Drive functionality.", "info")
     
@@ -4221,6 +4233,8 @@ def designer_selection_page():
                                     parent_task_id=parent_task_id,
                                     task_id=task['id']
                                 )
+                                # The cached schedule no longer includes this slot
+                                invalidate_schedule(uid, employee_id)
                                 
                                 if slot_id:
                                     # Update task with designer
@@ -4307,11 +4321,12 @@ def main():
     render_sidebar()                          # noqa: F821
 
     # Small live‑state panel
-    st.sidebar.write("Debug Info:")
-    st.sidebar.write(f"Logged in: {st.session_state.get('logged_in', False)}")
-    st.sidebar.write(f"Google Auth Complete: {st.session_state.get('google_auth_complete', False)}")
-    st.sidebar.write(f"Google Gmail Creds: {'google_gmail_creds' in st.session_state}")
-    st.sidebar.write(f"Google Drive Creds: {'google_drive_creds' in st.session_state}")
+    if DEBUG_AUTH:
+        st.sidebar.write("Debug Info:")
+        st.sidebar.write(f"Logged in: {st.session_state.get('logged_in', False)}")
+        st.sidebar.write(f"Google Auth Complete: {st.session_state.get('google_auth_complete', False)}")
+        st.sidebar.write(f"Google Gmail Creds: {'google_gmail_creds' in st.session_state}")
+        st.sidebar.write(f"Google Drive Creds: {'google_drive_creds' in st.session_state}")
 
     # ------------------------------------------------------------------
     # 4)  Login gate
@@ -4327,16 +4342,16 @@ def main():
         code = st.session_state.pop("pending_oauth_code")
 
         from google_auth import handle_oauth_callback  # local import avoids circular refs
-        create_notification("Finishing Google authentication…", "info")
-        success = handle_oauth_callback(code)
+        with st.spinner("Finishing Google authentication…"):
+            success = handle_oauth_callback(code)
 
         if success:
             create_notification("Google account linked – token saved to Supabase.", "success")
         else:
             create_notification("Google authentication failed. Please try again.", "error")
 
-        st.rerun()     # refresh state / UI regardless of outcome
-        return
+        # The callback already stored the credentials and auth flags in session_state,
+        # so the rest of this run renders the updated pages without a second rerun
 
     # ------------------------------------------------------------------
     # 6)  Optional Auth‑debug / Google‑auth pages (unchanged)
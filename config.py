@@ -1,7 +1,9 @@
 import streamlit as st
 import os
 import json
+import copy
 import logging
+import functools
 from typing import Optional, Dict, Any
 
 # Configure logging
@@ -44,13 +46,21 @@ def get_secret(key: str, default: Any = None) -> Any:
     # Fall back to environment variables
     return os.getenv(key, default)
 
+@functools.lru_cache(maxsize=1)
+def _parse_google_credentials() -> Dict[str, Any]:
+    """Parse the client config from secrets; raises instead of returning None so that
+    only successful parses are cached."""
+    client_config_str = st.secrets.get("gcp", {}).get("client_config")
+    if not client_config_str:
+        raise KeyError("gcp.client_config missing in secrets")
+    return json.loads(client_config_str)
+
 def get_google_credentials():
-    """Get Google API credentials as a dictionary."""
+    """Get Google API credentials as a dictionary (parsed once per process)."""
     try:
-        # Get client config from Streamlit secrets
-        client_config_str = st.secrets.get("gcp", {}).get("client_config")
-        if client_config_str:
-            return json.loads(client_config_str)
+        # Callers get their own copy, so the cached parse cannot be modified
+        return copy.deepcopy(_parse_google_credentials())
+    except KeyError:
         return None
     except Exception as e:
         logger.error(f"Error parsing Google credentials: {e}")
@@ -1,14 +1,23 @@
 import os
 import logging
 import time
+import functools
+import importlib.util
+import threading
+import xmlrpc.client
+import httpx
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional, Any, Union
+from cachetools import TTLCache
 from dotenv import load_dotenv
 import streamlit as st
 from openai import OpenAI  # Import the OpenAI class for v1.0+
 from config import get_secret  # Move this AFTER streamlit import
+from helpers import get_all_employees_in_planning, fetch_employee_schedule, find_employee_id, find_earliest_available_slot
 
 # Configure logging
 logging.basicConfig(
@@ -25,16 +34,35 @@ load_dotenv()
 DATA_DIR = Path(get_secret("DATA_DIR", "."))
 DEFAULT_DESIGNER_FILE = get_secret("DESIGNER_FILE", "Cleaned_Assignment_Guide.xlsx")
 
+# Columns used to build designer summaries
+DESIGNER_COLUMNS = ('Name', 'Position', 'Tools', 'Outputs', 'Languages')
+
+# pyarrow is optional: it backs the string columns and the Parquet copy of the designer sheet
+_HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Arrow-backed strings when pyarrow is available, nullable object strings otherwise
+STRING_DTYPE = pd.StringDtype("pyarrow") if _HAS_PYARROW else pd.StringDtype()
+
 # Add this after imports but before client initialization
 import inspect
 
+# Pooled HTTP client shared by every OpenAI call so TLS connections are reused
+# (over HTTP/2 when the optional h2 package is installed)
+_use_http2 = importlib.util.find_spec("h2") is not None
+
+_http_client = httpx.Client(
+    http2=_use_http2,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+    timeout=60.0,
+)
+
 # Then update the client initialization try/except with more debugging:
 try:
     api_key = get_secret("OPENAI_API_KEY")
     logger.info(f"Initializing OpenAI with key (first 8 chars): {api_key[:8] if api_key else 'None'}...")
     
     if api_key:
-        client = OpenAI(api_key=api_key)
+        client = OpenAI(api_key=api_key, http_client=_http_client)
         logger.info("Successfully created OpenAI client with v1.35.3")
         
         # Test the client with a simple API call
@@ -53,6 +81,87 @@ except Exception as e:
     logger.error(f"OpenAI initialization failed: {e}", exc_info=True)
     client = None
 
+# Token counting for prompt budgeting; falls back to a ~4 chars/token estimate
+SUMMARY_TOKEN_BUDGET = 2000
+
+@functools.lru_cache(maxsize=1)
+def _token_encoding():
+    """Loads the tiktoken encoding on first use (None if tiktoken or its BPE file is unavailable)."""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(get_secret("OPENAI_MODEL", "gpt-4"))
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Missing package, or the BPE download failed on an offline host
+        logger.warning(f"tiktoken unavailable, estimating token counts: {e}")
+        return None
+
+def _count_tokens(text: str) -> int:
+    """Returns the number of prompt tokens in text (estimated if tiktoken is unavailable)."""
+    encoding = _token_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(text) // 4 + 1
+
+# Static system prompts. Kept byte-identical across calls and sent first so the
+# OpenAI prompt cache can reuse the prefix; only the user message varies.
+RANKING_SYSTEM_PROMPT = """You are a design team coordinator who needs to rank designers based on their skills.
+Analyze the service request details and rank each designer with a meaningful score from 0 to 100.
+AVOID giving everyone the same score. Differentiate between designers based on their skills.
+
+Return your analysis in this EXACT JSON format:
+{
+"designers": [
+    {
+    "name": "Designer Name",
+    "score": 85,
+    "reason": "Brief explanation of score"
+    },
+    {
+    "name": "Another Designer",
+    "score": 72,
+    "reason": "Different explanation"
+    }
+]
+}
+
+IMPORTANT: Include ALL designers from the provided list and give reasonable scores that reflect skill match.
+DO NOT give everyone a 0% match - use the full 0-100 range with proper differentiation."""
+
+SUGGEST_SYSTEM_PROMPT = """You are a seasoned design consultant specializing in matching project requirements to designer capabilities and availability.
+Your task is to analyze the service request details and recommend the best designer from the available profiles.
+Return your recommendation in the format: "Designer Name: <n>. Explanation: <brief explanation>."
+At the end, note which designers would be good matches but are not currently available."""
+
+@functools.lru_cache(maxsize=64)
+def _build_user_prompt(instruction: str, request_info: str, designers_summary: str) -> str:
+    """
+    Builds the user message for a ranking/suggestion call.
+    
+    Args:
+        instruction: What the model should do with the profiles
+        request_info: Details of the service request
+        designers_summary: Compact designer summary
+        
+    Returns:
+        User prompt string
+    """
+    return f"""Based on the following service request details and the available designer profiles, 
+{instruction}:
+
+Service Request Details:
+{request_info}
+
+Designer Profiles (each line is: Name|Position|Tools|Outputs|Languages):
+{designers_summary}"""
+
+# Odoo schedules change slowly; reuse them briefly across availability checks
+SCHEDULE_CACHE_TTL = 60
+_schedule_cache = TTLCache(maxsize=512, ttl=SCHEDULE_CACHE_TTL)
+_schedule_cache_lock = threading.Lock()
+
 def safe_api_call(func, *args, retries=3, delay=7, **kwargs):
     """
     Wrapper for API calls that retries if an error occurs.
@@ -77,6 +186,46 @@ def safe_api_call(func, *args, retries=3, delay=7, **kwargs):
                 logger.error(f"API call failed after {retries} attempts: {e}", exc_info=True)
                 raise
 
+def _read_designer_file(path: Path) -> pd.DataFrame:
+    """
+    Reads the designer sheet, preferring a Parquet copy stored next to it.
+    
+    The Parquet copy is (re)written whenever it is missing or older than the
+    source file, so the Excel parse only happens once per change. Without
+    pyarrow the Excel file is read directly every time.
+    
+    Args:
+        path: Path to the designer file
+        
+    Returns:
+        Raw DataFrame as read from disk
+    """
+    if path.suffix.lower() == '.parquet':
+        return pd.read_parquet(path)
+    
+    parquet_path = path.with_suffix('.parquet')
+    try:
+        if _HAS_PYARROW and parquet_path.exists() and parquet_path.stat().st_mtime >= path.stat().st_mtime:
+            return pd.read_parquet(parquet_path)
+    except Exception as e:
+        logger.warning(f"Could not read cached designer file {parquet_path}: {e}")
+    
+    # calamine is much faster than openpyxl but needs pandas>=2.2 + python-calamine; with
+    # the pinned pandas 2.0.3 this raises ValueError and the default engine is used
+    try:
+        designers_df = pd.read_excel(path, engine='calamine')
+    except (ImportError, ValueError):
+        designers_df = pd.read_excel(path)
+    
+    if _HAS_PYARROW:
+        try:
+            designers_df.to_parquet(parquet_path, index=False)
+            logger.info(f"Cached designer file as: {parquet_path}")
+        except Exception as e:
+            logger.warning(f"Could not cache designer file as Parquet: {e}")
+    
+    return designers_df
+
 def load_designers(file_path: Optional[str] = None) -> pd.DataFrame:
     """
     Loads designer information from an Excel file.
@@ -104,15 +253,15 @@ def load_designers(file_path: Optional[str] = None) -> pd.DataFrame:
             raise FileNotFoundError(f"Designer file not found: {path}")
         
         logger.info(f"Loading designers from: {path}")
-        designers_df = pd.read_excel(path)
+        designers_df = _read_designer_file(path)
         
         # Basic data cleaning
         designers_df = designers_df.fillna('')
         
-        # Convert all string columns to strings (in case they're mixed types)
-        for col in designers_df.columns:
-            if designers_df[col].dtype == object:
-                designers_df[col] = designers_df[col].astype(str)
+        # Only the profile columns are read downstream; coerce just those
+        for col in DESIGNER_COLUMNS:
+            if col in designers_df:
+                designers_df[col] = designers_df[col].astype(STRING_DTYPE)
                 
         logger.info(f"Loaded {len(designers_df)} designers")
         return designers_df
@@ -120,15 +269,18 @@ def load_designers(file_path: Optional[str] = None) -> pd.DataFrame:
     except Exception as e:
         logger.error(f"Error loading designers: {e}", exc_info=True)
         # Return empty DataFrame instead of raising exception
-        return pd.DataFrame(columns=['Name', 'Position', 'Tools', 'Outputs', 'Languages'])
+        return pd.DataFrame(columns=list(DESIGNER_COLUMNS))
 
-def prepare_compact_designer_summary(designers_df: pd.DataFrame, max_designers: int = 5) -> str:
+def prepare_compact_designer_summary(designers_df: pd.DataFrame, max_designers: int = 5,
+                                     token_budget: Optional[int] = SUMMARY_TOKEN_BUDGET) -> str:
     """
     Converts the top max_designers rows of the designers DataFrame into a compact summary.
     
     Args:
         designers_df: DataFrame containing designer information
         max_designers: Maximum number of designers to include
+        token_budget: Stop adding designers once the summary would exceed this many tokens
+            (None includes all max_designers rows)
         
     Returns:
         String with one designer per line in a compact format
@@ -140,6 +292,7 @@ def prepare_compact_designer_summary(designers_df: pd.DataFrame, max_designers:
     try:
         selected_designers = designers_df.head(max_designers)
         summaries = []
+        used_tokens = 0
         
         for _, row in selected_designers.iterrows():
             # Using a pipe delimiter for compactness
@@ -150,6 +303,12 @@ def prepare_compact_designer_summary(designers_df: pd.DataFrame, max_designers:
                 f"{row.get('Outputs', 'N/A')}|"
                 f"{row.get('Languages', 'N/A')}"
             )
+            if token_budget is not None:
+                line_tokens = _count_tokens(line)
+                if summaries and used_tokens + line_tokens > token_budget:
+                    logger.info(f"Designer summary truncated at {len(summaries)} designers (token budget {token_budget})")
+                    break
+                used_tokens += line_tokens
             summaries.append(line)
             
         logger.info(f"Prepared summary for {len(summaries)} designers")
@@ -193,44 +352,14 @@ def suggest_best_designer(request_info: str, designers_df: pd.DataFrame, max_des
         designers_summary = prepare_compact_designer_summary(designers_df, max_designers=max_designers)
         
         # Prepare prompt
-        system_prompt = """You are a design team coordinator who needs to rank designers based on their skills.
-        Analyze the service request details and rank each designer with a meaningful score from 0 to 100.
-        AVOID giving everyone the same score. Differentiate between designers based on their skills.
-
-        Return your analysis in this EXACT JSON format:
-        {
-        "designers": [
-            {
-            "name": "Designer Name",
-            "score": 85,
-            "reason": "Brief explanation of score"
-            },
-            {
-            "name": "Another Designer",
-            "score": 72,
-            "reason": "Different explanation"
-            }
-        ]
-        }
-
-        IMPORTANT: Include ALL designers from the provided list and give reasonable scores that reflect skill match.
-        DO NOT give everyone a 0% match - use the full 0-100 range with proper differentiation."""
-        
-        user_prompt = f"""Based on the following service request details and the available designer profiles, 
-recommend the single best designer:
-
-Service Request Details:
-{request_info}
-
-Designer Profiles (each line is: Name|Position|Tools|Outputs|Languages):
-{designers_summary}"""
+        user_prompt = _build_user_prompt("recommend the single best designer", request_info, designers_summary)
         
         # Make API call using older openai library syntax
         response = safe_api_call(
             client.chat.completions.create,
             model=DEFAULT_MODEL,
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": RANKING_SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt}
             ],
             max_tokens=250,
@@ -249,6 +378,94 @@ Designer Profiles (each line is: Name|Position|Tools|Outputs|Languages):
         logger.error(f"Error suggesting designer: {e}", exc_info=True)
         return f"Error suggesting designer: {str(e)}"
 
+def _schedule_cache_key(uid, employee_id) -> Tuple:
+    """Cache key for an employee schedule, scoped to the logged-in Odoo database."""
+    return (st.session_state.odoo_credentials['db'], uid, employee_id)
+
+def _fetch_schedule(creds: Dict, uid, employee_id) -> List[Dict]:
+    """
+    Reads an employee's planning slots over a dedicated XML-RPC connection.
+    
+    ServerProxy instances are not thread-safe and st.session_state is not
+    available in worker threads, so everything needed is passed in.
+    """
+    models = xmlrpc.client.ServerProxy(f"{creds['url']}/xmlrpc/2/object", allow_none=True)
+    return fetch_employee_schedule(models, creds['db'], uid, creds['password'], employee_id)
+
+def prefetch_schedules(uid, employee_ids: List[int], max_workers: int = 8) -> None:
+    """
+    Fetches the schedules of several employees concurrently into the schedule cache.
+    
+    Args:
+        uid: User ID
+        employee_ids: Employee IDs to warm
+        max_workers: Maximum number of concurrent Odoo requests
+    """
+    creds = st.session_state.odoo_credentials
+    with _schedule_cache_lock:
+        missing = [eid for eid in dict.fromkeys(employee_ids) if _schedule_cache_key(uid, eid) not in _schedule_cache]
+    if not missing:
+        return
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+        futures = {pool.submit(_fetch_schedule, creds, uid, eid): eid for eid in missing}
+        for future in as_completed(futures):
+            employee_id = futures[future]
+            try:
+                schedule = future.result()
+            except Exception as e:
+                # Leave it uncached; the per-employee lookup will retry and report
+                logger.warning(f"Prefetching schedule failed for employee {employee_id}: {e}")
+                continue
+            with _schedule_cache_lock:
+                _schedule_cache[_schedule_cache_key(uid, employee_id)] = schedule
+    
+    logger.info(f"Prefetched schedules for {len(missing)} employees")
+
+def get_cached_employee_schedule(models, uid, employee_id) -> List[Dict]:
+    """
+    Returns an employee's schedule, reusing results fetched in the last SCHEDULE_CACHE_TTL seconds.
+    
+    Only successful reads are cached; a failed read is reported and returns an
+    empty schedule, and the next call asks Odoo again.
+    
+    Args:
+        models: Odoo models proxy
+        uid: User ID
+        employee_id: Employee ID
+        
+    Returns:
+        List of schedule records
+    """
+    key = _schedule_cache_key(uid, employee_id)
+    with _schedule_cache_lock:
+        if key in _schedule_cache:
+            return _schedule_cache[key]
+    
+    creds = st.session_state.odoo_credentials
+    try:
+        schedule = fetch_employee_schedule(models, creds['db'], uid, creds['password'], employee_id)
+    except Exception as e:
+        logger.error(f"Error fetching employee schedule: {e}", exc_info=True)
+        st.error(f"Error retrieving employee schedule: {e}")
+        return []
+    
+    with _schedule_cache_lock:
+        _schedule_cache[key] = schedule
+    return schedule
+
+def invalidate_schedule(uid, employee_id) -> None:
+    """
+    Drops an employee's cached schedule, so the next availability check sees
+    planning slots this app has just booked for them.
+    
+    Args:
+        uid: User ID
+        employee_id: Employee ID
+    """
+    with _schedule_cache_lock:
+        _schedule_cache.pop(_schedule_cache_key(uid, employee_id), None)
+
 def filter_designers_by_availability(designers_df: pd.DataFrame, models, uid, deadline, task_duration) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Filters designers based on availability before the deadline.
@@ -263,8 +480,6 @@ def filter_designers_by_availability(designers_df: pd.DataFrame, models, uid, de
     Returns:
         Tuple of DataFrames (available, not_available)
     """
-    from helpers import get_all_employees_in_planning, get_employee_schedule, find_employee_id, find_earliest_available_slot
-    
     if designers_df.empty:
         logger.warning("Empty designers DataFrame provided")
         return pd.DataFrame(), pd.DataFrame()
@@ -274,14 +489,22 @@ def filter_designers_by_availability(designers_df: pd.DataFrame, models, uid, de
         
         # Get all employees from planning
         employees = get_all_employees_in_planning(models, uid)
+        get_schedule = functools.partial(get_cached_employee_schedule, models, uid)
         available = []
         not_available = []
         
+        # Resolve employee IDs up front so all schedules can be fetched concurrently
+        employee_ids = {
+            name: find_employee_id(name, employees)
+            for name in designers_df.get("Name", pd.Series(dtype=object))
+        }
+        prefetch_schedules(uid, [eid for eid in employee_ids.values() if eid])
+        
         for _, row in designers_df.iterrows():
             name = row.get("Name", "")
             
             # Find employee ID
-            employee_id = find_employee_id(name, employees)
+            employee_id = employee_ids.get(name)
             
             if not employee_id:
                 logger.warning(f"Employee not found in planning: {name}")
@@ -289,7 +512,7 @@ def filter_designers_by_availability(designers_df: pd.DataFrame, models, uid, de
                 continue
                 
             # Get employee schedule
-            schedule = get_employee_schedule(models, uid, employee_id)
+            schedule = get_schedule(employee_id)
             
             # Find available slot
             slot = find_earliest_available_slot(schedule, task_duration, deadline)
@@ -390,11 +613,6 @@ def suggest_best_designer_available(request_info: str, available_designers_df: p
         not_available_summary = prepare_compact_designer_summary(not_available_designers_df, max_designers=max_designers)
         
         # Prepare prompt
-        system_prompt = """You are a seasoned design consultant specializing in matching project requirements to designer capabilities and availability.
-Your task is to analyze the service request details and recommend the best designer from the available profiles.
-Return your recommendation in the format: "Designer Name: <n>. Explanation: <brief explanation>."
-At the end, note which designers would be good matches but are not currently available."""
-        
         user_prompt = f"""Based on the following service request details and the available designer profiles, 
 recommend the single best designer that is available to complete the task:
 
@@ -412,7 +630,7 @@ Not Available Designer Profiles (each line: Name|Position|Tools|Outputs|Language
             client.chat.completions.create,
             model=DEFAULT_MODEL,
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": SUGGEST_SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt}
             ],
             max_tokens=350,
@@ -431,6 +649,27 @@ Not Available Designer Profiles (each line: Name|Position|Tools|Outputs|Language
         logger.error(f"Error suggesting available designer: {e}", exc_info=True)
         return f"Error suggesting available designer: {str(e)}"
 
+def _ranking_max_tokens(designers_summary: str) -> int:
+    """Sizes the ranking response budget to the number of designers in the summary,
+    leaving room for each entry's name, score and one-sentence reason."""
+    designer_count = designers_summary.count("\n") + 1
+    return min(4000, 200 + 120 * designer_count)
+
+def _designer_names(designers_df: pd.DataFrame) -> np.ndarray:
+    """
+    Returns the non-empty designer names as an object array.
+    
+    Args:
+        designers_df: DataFrame containing designer information
+        
+    Returns:
+        Array of designer names
+    """
+    if "Name" not in designers_df:
+        return np.array([], dtype=object)
+    names = designers_df["Name"].fillna("").astype(str).to_numpy(dtype=object)
+    return names[names != ""]
+
 # Additional utility function
 def rank_designers_by_skill_match(request_info: str, designers_df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -449,52 +688,22 @@ def rank_designers_by_skill_match(request_info: str, designers_df: pd.DataFrame)
         return designers_df
     
     try:
-        # Prepare designer summary (include all designers)
-        designers_summary = prepare_compact_designer_summary(designers_df, max_designers=len(designers_df))
+        # Prepare designer summary (include all designers: every one of them must get a score)
+        designers_summary = prepare_compact_designer_summary(designers_df, max_designers=len(designers_df),
+                                                             token_budget=None)
         
         # Prepare prompt
-        # Replace the system_prompt in rank_designers_by_skill_match with:
-        system_prompt = """You are a design team coordinator who needs to rank designers based on their skills.
-        Analyze the service request details and rank each designer with a meaningful score from 0 to 100.
-        AVOID giving everyone the same score. Differentiate between designers based on their skills.
-
-        Return your analysis in this EXACT JSON format:
-        {
-        "designers": [
-            {
-            "name": "Designer Name",
-            "score": 85,
-            "reason": "Brief explanation of score"
-            },
-            {
-            "name": "Another Designer",
-            "score": 72,
-            "reason": "Different explanation"
-            }
-        ]
-        }
-
-        IMPORTANT: Include ALL designers from the provided list and give reasonable scores that reflect skill match.
-        DO NOT give everyone a 0% match - use the full 0-100 range with proper differentiation."""
-        
-        user_prompt = f"""Based on the following service request details and the available designer profiles, 
-rank each designer on their match to the requirements:
-
-Service Request Details:
-{request_info}
-
-Designer Profiles (each line is: Name|Position|Tools|Outputs|Languages):
-{designers_summary}"""
+        user_prompt = _build_user_prompt("rank each designer on their match to the requirements", request_info, designers_summary)
         
         # Make API call using older openai library syntax
         response = safe_api_call(
             client.chat.completions.create,
             model=DEFAULT_MODEL,
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": RANKING_SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt}
             ],
-            max_tokens=1500,
+            max_tokens=_ranking_max_tokens(designers_summary),
             temperature=0.3,
         )
         
@@ -506,6 +715,9 @@ Designer Profiles (each line is: Name|Position|Tools|Outputs|Languages):
             response_text = response.choices[0].message.content.strip()
             logger.info(f"Raw AI response: {response_text[:200]}...")  # Log first 200 chars
             
+            if response.choices[0].finish_reason == "length":
+                raise ValueError("ranking response was cut off at max_tokens")
+            
             # Try to parse the JSON
             result = json.loads(response_text)
             
@@ -546,27 +758,22 @@ Designer Profiles (each line is: Name|Position|Tools|Outputs|Languages):
             
             # If we still have no scores but have designers, create default scores
             if not designer_scores and not designers_df.empty:
-                for _, row in designers_df.iterrows():
-                    name = row.get("Name", "")
-                    if name:
-                        designer_scores[name] = {
-                            "score": 50,  # Default 50% match
-                            "reason": "Default score assigned"
-                        }
+                designer_scores = {
+                    name: {"score": 50, "reason": "Default score assigned"}  # Default 50% match
+                    for name in _designer_names(designers_df)
+                }
             
             logger.info(f"Extracted scores for {len(designer_scores)} designers")
             
         except Exception as e:
             logger.error(f"Error parsing AI response: {e}")
-            # Create default scores on error
-            designer_scores = {}
-            for _, row in designers_df.iterrows():
-                name = row.get("Name", "")
-                if name:
-                    designer_scores[name] = {
-                        "score": 30 + hash(name) % 40,  # Random-ish scores between 30-70%
-                        "reason": "Score estimated due to processing error"
-                    }
+            # Create default scores on error: stable pseudo-random scores between 30-70%
+            names = _designer_names(designers_df)
+            scores = 30 + pd.util.hash_array(names) % 40
+            designer_scores = {
+                name: {"score": int(score), "reason": "Score estimated due to processing error"}
+                for name, score in zip(names, scores)
+            }
         # Add scores to the DataFrame
         designers_df = designers_df.copy()
         designers_df["match_score"] = designers_df["Name"].apply(
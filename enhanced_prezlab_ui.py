@@ -1,9 +1,10 @@
 # enhanced_prezlab_ui.py
-import streamlit as st
 import base64
-from pathlib import Path
-import json
-from datetime import datetime
+import functools
+import html
+import streamlit as st
+import jinja2
+from typing import Final
 
 # Enhanced Color Palette
 COLORS = {
@@ -33,361 +34,565 @@ COLORS = {
     "info": "#17A2B8"
 }
 
-def inject_enhanced_css():
-    """Inject modern, animated CSS with glassmorphism and smooth transitions"""
-    css = f"""
-    <style>
-    /* Import Google Fonts */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    /* Global Styles */
-    .stApp {{
-        font-family: 'Inter', 'sans serif';
-        background: linear-gradient(135deg, {COLORS['light_purple']} 0%, {COLORS['white']} 50%, {COLORS['light_gray']} 100%);
-        background-attachment: fixed;
-    }}
-    
-    /* Hide Streamlit branding */
-    #MainMenu {{visibility: hidden;}}
-    footer {{visibility: hidden;}}
-    header {{visibility: hidden;}}
-    
-    /* Animated Background Pattern */
-    .stApp::before {{
-        content: "";
-        position: fixed;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background-image: 
-            radial-gradient(circle at 20% 50%, {COLORS['primary_purple']}20 0%, transparent 50%),
-            radial-gradient(circle at 80% 80%, {COLORS['coral']}20 0%, transparent 50%),
-            radial-gradient(circle at 40% 20%, {COLORS['yellow']}20 0%, transparent 50%);
-        z-index: -1;
-        animation: float 20s ease-in-out infinite;
-    }}
-    
-    @keyframes float {{
-        0%, 100% {{ transform: translateY(0px); }}
-        50% {{ transform: translateY(-20px); }}
-    }}
-    
-    /* Glassmorphism Cards */
-    .glass-card {{
-        background: rgba(255, 255, 255, 0.7);
-        backdrop-filter: blur(10px);
-        -webkit-backdrop-filter: blur(10px);
-        border-radius: 20px;
-        border: 1px solid rgba(255, 255, 255, 0.3);
-        box-shadow: 0 8px 32px 0 rgba(128, 90, 249, 0.1);
-        padding: 2rem;
-        margin: 1rem 0;
-        transition: all 0.3s ease;
-    }}
-    
-    .glass-card:hover {{
-        transform: translateY(-5px);
-        box-shadow: 0 12px 40px 0 rgba(128, 90, 249, 0.2);
-    }}
-    
-    /* Interactive Buttons */
-    .stButton > button {{
-        background: linear-gradient(135deg, {COLORS['primary_purple']} 0%, {COLORS['dark_purple']} 100%);
-        color: white;
-        border: none;
-        padding: 0.75rem 2rem;
-        border-radius: 50px;
-        font-weight: 600;
-        transition: all 0.3s ease;
-        box-shadow: 0 4px 15px 0 rgba(128, 90, 249, 0.3);
-        position: relative;
-        overflow: hidden;
-    }}
-    
-    .stButton > button::before {{
-        content: "";
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(90deg, transparent, rgba(255,255,255,0.2), transparent);
-        transition: left 0.5s;
-    }}
-    
-    .stButton > button:hover::before {{
-        left: 100%;
-    }}
-    
-    .stButton > button:hover {{
-        transform: translateY(-2px);
-        box-shadow: 0 6px 20px 0 rgba(128, 90, 249, 0.4);
-    }}
-    
-    /* Secondary Button Style */
-    .secondary-button > button {{
-        background: transparent;
-        color: {COLORS['primary_purple']};
-        border: 2px solid {COLORS['primary_purple']};
-        padding: 0.75rem 2rem;
-        border-radius: 50px;
-        font-weight: 600;
-        transition: all 0.3s ease;
-    }}
-    
-    .secondary-button > button:hover {{
-        background: {COLORS['primary_purple']};
-        color: white;
-        transform: translateY(-2px);
-    }}
-    
-    /* Enhanced Input Fields */
-    .stTextInput > div > div > input,
-    .stSelectbox > div > div > select,
-    .stTextArea > div > div > textarea {{
-        background: rgba(255, 255, 255, 0.9);
-        border: 2px solid {COLORS['light_purple']};
-        border-radius: 12px;
-        padding: 0.75rem 1rem;
-        transition: all 0.3s ease;
-        font-family: 'Inter', 'sans serif';
-    }}
-    
-    .stTextInput > div > div > input:focus,
-    .stSelectbox > div > div > select:focus,
-    .stTextArea > div > div > textarea:focus {{
-        border-color: {COLORS['primary_purple']};
-        box-shadow: 0 0 0 3px {COLORS['primary_purple']}20;
-        outline: none;
-    }}
-    
-    /* Animated Progress Bar */
-    .progress-container {{
-        background: {COLORS['light_gray']};
-        border-radius: 50px;
-        padding: 4px;
-        margin: 2rem 0;
-    }}
-    
-    .progress-bar {{
-        background: linear-gradient(90deg, {COLORS['primary_purple']}, {COLORS['coral']});
-        height: 8px;
-        border-radius: 50px;
-        transition: width 0.5s ease;
-        position: relative;
-        overflow: hidden;
-    }}
-    
-    .progress-bar::after {{
-        content: "";
-        position: absolute;
-        top: 0;
-        left: 0;
-        right: 0;
-        bottom: 0;
-        background: linear-gradient(
-            90deg,
-            transparent,
-            rgba(255, 255, 255, 0.3),
-            transparent
-        );
-        animation: shimmer 2s infinite;
-    }}
-    
-    @keyframes shimmer {{
-        0% {{ transform: translateX(-100%); }}
-        100% {{ transform: translateX(100%); }}
-    }}
-    
-    /* Floating Action Button */
-    .fab {{
-        position: fixed;
-        bottom: 2rem;
-        right: 2rem;
-        width: 60px;
-        height: 60px;
-        background: linear-gradient(135deg, {COLORS['primary_purple']} 0%, {COLORS['dark_purple']} 100%);
-        border-radius: 50%;
-        box-shadow: 0 4px 20px rgba(128, 90, 249, 0.4);
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        z-index: 1000;
-    }}
-    
-    .fab:hover {{
-        transform: scale(1.1) rotate(90deg);
-        box-shadow: 0 6px 25px rgba(128, 90, 249, 0.5);
-    }}
-    
-    /* Animated Cards */
-    .task-card {{
-        background: white;
-        border-radius: 16px;
-        padding: 1.5rem;
-        margin: 1rem 0;
-        box-shadow: 0 4px 20px rgba(0, 0, 0, 0.08);
-        transition: all 0.3s ease;
-        border-left: 4px solid {COLORS['primary_purple']};
-        position: relative;
-        overflow: hidden;
-    }}
-    
-    .task-card::before {{
-        content: "";
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(90deg, transparent, {COLORS['primary_purple']}10, transparent);
-        transition: left 0.5s;
-    }}
-    
-    .task-card:hover::before {{
-        left: 100%;
-    }}
-    
-    .task-card:hover {{
-        transform: translateX(5px);
-        box-shadow: 0 6px 25px rgba(0, 0, 0, 0.12);
-    }}
-    
-    /* Status Pills */
-    .status-pill {{
-        display: inline-block;
-        padding: 0.25rem 1rem;
-        border-radius: 50px;
-        font-size: 0.875rem;
-        font-weight: 600;
-        margin: 0.25rem;
-        animation: fadeIn 0.5s ease;
-    }}
-    
-    .status-active {{
-        background: {COLORS['success']}20;
-        color: {COLORS['success']};
-    }}
-    
-    .status-pending {{
-        background: {COLORS['warning']}20;
-        color: {COLORS['warning']};
-    }}
-    
-    .status-completed {{
-        background: {COLORS['info']}20;
-        color: {COLORS['info']};
-    }}
-    
-    /* Animated Title */
-    .animated-title {{
-        font-size: 3rem;
-        font-weight: 700;
-        background: linear-gradient(90deg, {COLORS['primary_purple']}, {COLORS['coral']}, {COLORS['primary_purple']});
-        background-size: 200% auto;
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        animation: gradient 3s ease infinite;
-        text-align: center;
-        margin: 2rem 0;
-    }}
-    
-    @keyframes gradient {{
-        0% {{ background-position: 0% 50%; }}
-        50% {{ background-position: 100% 50%; }}
-        100% {{ background-position: 0% 50%; }}
-    }}
-    
-    @keyframes fadeIn {{
-        from {{ opacity: 0; transform: translateY(10px); }}
-        to {{ opacity: 1; transform: translateY(0); }}
-    }}
-    
-    /* Tooltip */
-    .tooltip {{
-        position: relative;
-        display: inline-block;
-    }}
-    
-    .tooltip .tooltiptext {{
-        visibility: hidden;
-        width: 200px;
-        background-color: {COLORS['navy']};
-        color: white;
-        text-align: center;
-        border-radius: 8px;
-        padding: 0.5rem;
-        position: absolute;
-        z-index: 1;
-        bottom: 125%;
-        left: 50%;
-        margin-left: -100px;
-        opacity: 0;
-        transition: opacity 0.3s;
-        font-size: 0.875rem;
-    }}
-    
-    .tooltip:hover .tooltiptext {{
-        visibility: visible;
-        opacity: 1;
-    }}
-    
-    /* Loading Animation */
-    .loader {{
-        width: 50px;
-        height: 50px;
-        border: 3px solid {COLORS['light_purple']};
-        border-top-color: {COLORS['primary_purple']};
-        border-radius: 50%;
-        animation: spin 1s linear infinite;
-        margin: 2rem auto;
-    }}
-    
-    @keyframes spin {{
-        to {{ transform: rotate(360deg); }}
-    }}
-    
-    /* Notification Badge */
-    .notification-badge {{
-        position: absolute;
-        top: -8px;
-        right: -8px;
-        background: {COLORS['coral']};
-        color: white;
-        border-radius: 50%;
-        width: 24px;
-        height: 24px;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        font-size: 0.75rem;
-        font-weight: 700;
-        animation: pulse 2s infinite;
-    }}
+def _radial_spot(gradient_id, cx, cy, color):
+    """SVG gradient + rect for one soft color spot (~12% opacity at the center)"""
+    gradient = (
+        f'<radialGradient id="{gradient_id}" cx="{cx}" cy="{cy}" r="50%">'
+        f'<stop offset="0%" stop-color="{color}" stop-opacity="0.125"/>'
+        f'<stop offset="100%" stop-color="{color}" stop-opacity="0"/>'
+        '</radialGradient>'
+    )
+    return gradient, f'<rect width="800" height="800" fill="url(#{gradient_id})"/>'
+
+# Page background: three soft radial spots baked into one static SVG, so the
+# browser paints it once instead of compositing an animated full-screen layer
+_background_spots = [
+    _radial_spot("g1", "20%", "50%", COLORS['primary_purple']),
+    _radial_spot("g2", "80%", "80%", COLORS['coral']),
+    _radial_spot("g3", "40%", "20%", COLORS['yellow']),
+]
+_BACKGROUND_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="800" height="800" '
+    'viewBox="0 0 800 800" preserveAspectRatio="none"><defs>'
+    + ''.join(gradient for gradient, _ in _background_spots)
+    + '</defs>'
+    + ''.join(rect for _, rect in _background_spots)
+    + '</svg>'
+)
+_BACKGROUND_DATA_URI = "data:image/svg+xml;base64," + base64.b64encode(_BACKGROUND_SVG.encode()).decode()
+
+# Inter font, loaded via <link> so the fetch starts in parallel with the
+# stylesheet instead of after parsing a CSS @import
+_FONT_LINKS = (
+    '<link rel="preconnect" href="https://fonts.googleapis.com">'
+    '<link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>'
+    '<link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap">'
+)
+
+# Stylesheets, compiled once at import and rendered with COLORS. The core
+# sheet is always injected; component sheets only when a page asks for them.
+_jinja_env = jinja2.Environment(auto_reload=False)
+
+_CORE_CSS_TEMPLATE = _jinja_env.from_string("""
+/* Global Styles */
+.stApp {
+    font-family: 'Inter', 'sans serif';
+    background: linear-gradient(135deg, {{ light_purple }} 0%, {{ white }} 50%, {{ light_gray }} 100%);
+    background-attachment: fixed;
+}
+
+/* Hide Streamlit branding */
+#MainMenu {visibility: hidden;}
+footer {visibility: hidden;}
+header {visibility: hidden;}
+
+/* Background Pattern (static, pre-rendered SVG) */
+.stApp::before {
+    content: "";
+    position: fixed;
+    top: 0;
+    left: 0;
+    width: 100%;
+    height: 100%;
+    background-image: url("{{ background_uri }}");
+    background-size: cover;
+    background-repeat: no-repeat;
+    z-index: -1;
+}
+
+@keyframes float {
+    0%, 100% { transform: translateY(0px); }
+    50% { transform: translateY(-20px); }
+}
+
+/* Glassmorphism Cards (near-opaque fill instead of a per-frame backdrop blur) */
+.glass-card {
+    background: rgba(255, 255, 255, 0.92);
+    border-radius: 20px;
+    border: 1px solid rgba(255, 255, 255, 0.3);
+    box-shadow: 0 8px 32px 0 rgba(128, 90, 249, 0.1);
+    padding: 2rem;
+    margin: 1rem 0;
+    transition: all 0.3s ease;
+}
+
+.glass-card:hover {
+    transform: translateY(-5px);
+    box-shadow: 0 12px 40px 0 rgba(128, 90, 249, 0.2);
+}
+
+/* Interactive Buttons */
+.stButton > button {
+    background: linear-gradient(135deg, {{ primary_purple }} 0%, {{ dark_purple }} 100%);
+    color: white;
+    border: none;
+    padding: 0.75rem 2rem;
+    border-radius: 50px;
+    font-weight: 600;
+    transition: all 0.3s ease;
+    box-shadow: 0 4px 15px 0 rgba(128, 90, 249, 0.3);
+    position: relative;
+    overflow: hidden;
+}
+
+.stButton > button::before {
+    content: "";
+    position: absolute;
+    top: 0;
+    left: -100%;
+    width: 100%;
+    height: 100%;
+    background: linear-gradient(90deg, transparent, rgba(255,255,255,0.2), transparent);
+    transition: left 0.5s;
+}
+
+.stButton > button:hover::before {
+    left: 100%;
+}
+
+.stButton > button:hover {
+    transform: translateY(-2px);
+    box-shadow: 0 6px 20px 0 rgba(128, 90, 249, 0.4);
+}
+
+/* Secondary Button Style */
+.secondary-button > button {
+    background: transparent;
+    color: {{ primary_purple }};
+    border: 2px solid {{ primary_purple }};
+    padding: 0.75rem 2rem;
+    border-radius: 50px;
+    font-weight: 600;
+    transition: all 0.3s ease;
+}
+
+.secondary-button > button:hover {
+    background: {{ primary_purple }};
+    color: white;
+    transform: translateY(-2px);
+}
+
+/* Enhanced Input Fields */
+.stTextInput > div > div > input,
+.stSelectbox > div > div > select,
+.stTextArea > div > div > textarea {
+    background: rgba(255, 255, 255, 0.9);
+    border: 2px solid {{ light_purple }};
+    border-radius: 12px;
+    padding: 0.75rem 1rem;
+    transition: all 0.3s ease;
+    font-family: 'Inter', 'sans serif';
+}
+
+.stTextInput > div > div > input:focus,
+.stSelectbox > div > div > select:focus,
+.stTextArea > div > div > textarea:focus {
+    border-color: {{ primary_purple }};
+    box-shadow: 0 0 0 3px {{ primary_purple }}20;
+    outline: none;
+}
+
+/* Animated Title */
+.animated-title {
+    font-size: 3rem;
+    font-weight: 700;
+    background: linear-gradient(90deg, {{ primary_purple }}, {{ coral }}, {{ primary_purple }});
+    background-size: 200% auto;
+    -webkit-background-clip: text;
+    -webkit-text-fill-color: transparent;
+    animation: gradient 3s ease infinite;
+    text-align: center;
+    margin: 2rem 0;
+}
+
+@keyframes gradient {
+    0% { background-position: 0% 50%; }
+    50% { background-position: 100% 50%; }
+    100% { background-position: 0% 50%; }
+}
+
+@keyframes fadeIn {
+    from { opacity: 0; transform: translateY(10px); }
+    to { opacity: 1; transform: translateY(0); }
+}
+
+/* Loading Animation */
+.loader {
+    width: 50px;
+    height: 50px;
+    border: 3px solid {{ light_purple }};
+    border-top-color: {{ primary_purple }};
+    border-radius: 50%;
+    animation: spin 1s linear infinite;
+    margin: 2rem auto;
+}
+
+@keyframes spin {
+    to { transform: rotate(360deg); }
+}
+
+/* Stop the infinite animations for users who ask for reduced motion */
+@media (prefers-reduced-motion: reduce) {
+    *, *::before, *::after {
+        animation: none !important;
+        transition: none !important;
+    }
+}
+
+/* Responsive Design */
+@media (max-width: 768px) {
+    .glass-card {
+        padding: 1rem;
+        margin: 0.5rem 0;
+    }
     
-    @keyframes pulse {{
-        0% {{ transform: scale(1); box-shadow: 0 0 0 0 {COLORS['coral']}40; }}
-        70% {{ transform: scale(1.1); box-shadow: 0 0 0 10px transparent; }}
-        100% {{ transform: scale(1); box-shadow: 0 0 0 0 transparent; }}
-    }}
+    .animated-title {
+        font-size: 2rem;
+    }
+}
+""")
+
+_COMPONENT_CSS_TEMPLATES = {
+    "progress": _jinja_env.from_string("""
+/* Animated Progress Bar */
+.progress-container {
+    background: {{ light_gray }};
+    border-radius: 50px;
+    padding: 4px;
+    margin: 2rem 0;
+}
+
+.progress-bar {
+    background: linear-gradient(90deg, {{ primary_purple }}, {{ coral }});
+    height: 8px;
+    border-radius: 50px;
+    transition: width 0.5s ease;
+    position: relative;
+    overflow: hidden;
+}
+
+.progress-bar::after {
+    content: "";
+    position: absolute;
+    top: 0;
+    left: 0;
+    right: 0;
+    bottom: 0;
+    background: linear-gradient(
+        90deg,
+        transparent,
+        rgba(255, 255, 255, 0.3),
+        transparent
+    );
+    animation: shimmer 2s infinite;
+}
+
+@keyframes shimmer {
+    0% { transform: translateX(-100%); }
+    100% { transform: translateX(100%); }
+}
+"""),
+    "fab": _jinja_env.from_string("""
+/* Floating Action Button */
+.fab {
+    position: fixed;
+    bottom: 2rem;
+    right: 2rem;
+    width: 60px;
+    height: 60px;
+    background: linear-gradient(135deg, {{ primary_purple }} 0%, {{ dark_purple }} 100%);
+    border-radius: 50%;
+    box-shadow: 0 4px 20px rgba(128, 90, 249, 0.4);
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    cursor: pointer;
+    transition: all 0.3s ease;
+    z-index: 1000;
+}
+
+.fab:hover {
+    transform: scale(1.1) rotate(90deg);
+    box-shadow: 0 6px 25px rgba(128, 90, 249, 0.5);
+}
+"""),
+    "task_card": _jinja_env.from_string("""
+/* Animated Cards */
+.task-card {
+    background: white;
+    border-radius: 16px;
+    padding: 1.5rem;
+    margin: 1rem 0;
+    box-shadow: 0 4px 20px rgba(0, 0, 0, 0.08);
+    transition: all 0.3s ease;
+    border-left: 4px solid {{ primary_purple }};
+    position: relative;
+    overflow: hidden;
+}
+
+.task-card::before {
+    content: "";
+    position: absolute;
+    top: 0;
+    left: -100%;
+    width: 100%;
+    height: 100%;
+    background: linear-gradient(90deg, transparent, {{ primary_purple }}10, transparent);
+    transition: left 0.5s;
+}
+
+.task-card:hover::before {
+    left: 100%;
+}
+
+.task-card:hover {
+    transform: translateX(5px);
+    box-shadow: 0 6px 25px rgba(0, 0, 0, 0.12);
+}
+
+/* Status Pills */
+.status-pill {
+    display: inline-block;
+    padding: 0.25rem 1rem;
+    border-radius: 50px;
+    font-size: 0.875rem;
+    font-weight: 600;
+    margin: 0.25rem;
+    animation: fadeIn 0.5s ease;
+}
+
+.status-active {
+    background: {{ success }}20;
+    color: {{ success }};
+}
+
+.status-pending {
+    background: {{ warning }}20;
+    color: {{ warning }};
+}
+
+.status-completed {
+    background: {{ info }}20;
+    color: {{ info }};
+}
+"""),
+    "tooltip": _jinja_env.from_string("""
+/* Tooltip */
+.tooltip {
+    position: relative;
+    display: inline-block;
+}
+
+.tooltip .tooltiptext {
+    visibility: hidden;
+    width: 200px;
+    background-color: {{ navy }};
+    color: white;
+    text-align: center;
+    border-radius: 8px;
+    padding: 0.5rem;
+    position: absolute;
+    z-index: 1;
+    bottom: 125%;
+    left: 50%;
+    margin-left: -100px;
+    opacity: 0;
+    transition: opacity 0.3s;
+    font-size: 0.875rem;
+}
+
+.tooltip:hover .tooltiptext {
+    visibility: visible;
+    opacity: 1;
+}
+"""),
+    "counter": _jinja_env.from_string("""
+/* Animated Number Counter: interpolates an integer custom property and
+   prints it with a CSS counter. Browsers without @property jump straight
+   to the final value. */
+@property --counter-value {
+    syntax: "<integer>";
+    inherits: false;
+    initial-value: 0;
+}
+
+.animated-counter {
+    font-size: 2.5rem;
+    font-weight: 700;
+    color: {{ primary_purple }};
+}
+
+.animated-counter .counter-value {
+    --counter-value: var(--counter-to);
+    counter-reset: counter-value var(--counter-value);
+    animation: count-up var(--counter-duration, 1000ms) ease-out;
+}
+
+.animated-counter .counter-value::after {
+    content: counter(counter-value);
+}
+
+@keyframes count-up {
+    from { --counter-value: var(--counter-from); }
+    to { --counter-value: var(--counter-to); }
+}
+"""),
+    "notification_badge": _jinja_env.from_string("""
+/* Notification Badge */
+.notification-badge {
+    position: absolute;
+    top: -8px;
+    right: -8px;
+    background: {{ coral }};
+    color: white;
+    border-radius: 50%;
+    width: 24px;
+    height: 24px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    font-size: 0.75rem;
+    font-weight: 700;
+    animation: pulse 2s infinite;
+}
+
+@keyframes pulse {
+    0% { transform: scale(1); box-shadow: 0 0 0 0 {{ coral }}40; }
+    70% { transform: scale(1.1); box-shadow: 0 0 0 10px transparent; }
+    100% { transform: scale(1); box-shadow: 0 0 0 0 transparent; }
+}
+"""),
+}
+
+@st.cache_data(show_spinner=False)
+def _build_enhanced_css(components):
+    """Render the core sheet plus the given component sheets; cached per combination"""
+    sheets = [_CORE_CSS_TEMPLATE] + [_COMPONENT_CSS_TEMPLATES[name] for name in components]
+    context = dict(COLORS, background_uri=_BACKGROUND_DATA_URI)
+    return _FONT_LINKS + "<style>\n" + "\n".join(sheet.render(**context) for sheet in sheets) + "</style>"
+
+def inject_enhanced_css(components=None):
+    """Inject modern, animated CSS with glassmorphism and smooth transitions
     
-    /* Responsive Design */
-    @media (max-width: 768px) {{
-        .glass-card {{
-            padding: 1rem;
-            margin: 0.5rem 0;
-        }}
-        
-        .animated-title {{
-            font-size: 2rem;
-        }}
-    }}
-    </style>
+    Args:
+        components: Component sheets to include on top of the core styles
+            (keys of _COMPONENT_CSS_TEMPLATES). Defaults to all of them.
     """
-    st.markdown(css, unsafe_allow_html=True)
+    if components is None:
+        components = _COMPONENT_CSS_TEMPLATES
+    # Emitted on every run: Streamlit drops elements a rerun does not re-send,
+    # and an unchanged payload is cheap for the frontend to reconcile.
+    st.markdown(_build_enhanced_css(tuple(components)), unsafe_allow_html=True)
+
+# ─── Static HTML fragments ────────────────────────────────────────────────────
+# Only the truly dynamic fields are interpolated per call; everything else is
+# formatted once here.
+
+_GLASS_CARD_OPEN = '<div class="glass-card-wrapper" style="padding: 1.5rem; margin: 1rem 0;">'
+
+# Shared by show_loading_animation and show_loading_with_progress
+_LOADER_PREFIX = (
+    '<div style="text-align: center; padding: 2rem;"><div class="loader"></div>'
+    f'<p style="color: {COLORS["dark_gray"]}; margin-top: 1rem;">'
+)
+_LOADER_SUFFIX = '</p></div>'
+_LOADER_PROGRESS_OPEN = (
+    '<div style="margin-top: 1rem;">'
+    '<div style="background: #e0e0e0; border-radius: 10px; overflow: hidden;">'
+    f'<div style="background: {COLORS["primary_purple"]}; width: '
+)
+_LOADER_STEP_OPEN = f'<p style="color: {COLORS["dark_gray"]}; font-size: 0.875rem; margin-top: 0.5rem;">'
+
+_TASK_CARD_HEAD = (
+    '<div class="task-card">'
+    '<div style="display: flex; justify-content: space-between; align-items: start;">'
+    f'<h4 style="color: {COLORS["navy"]}; margin: 0;">'
+)
+_TASK_CARD_INFO_OPEN = f'<p style="color: {COLORS["dark_gray"]}; margin: 0.5rem 0;">'
+_TASK_CARD_TAIL = '</div>'
+
+# Task status -> (pill class, label)
+_STATUS = {
+    "pending": ("status-pending", "Pending"),
+    "active": ("status-active", "Active"),
+    "completed": ("status-completed", "Completed"),
+}
+
+@functools.lru_cache(maxsize=32)
+def _status_pill(status):
+    """Status pill HTML for a task status"""
+    status_class, status_text = _STATUS.get(status) or (f"status-{status}", status.capitalize())
+    return f'<span class="status-pill {status_class}">{status_text}</span>'
+
+# Colors are filled in here; only {initial} and {name} remain per call
+_ASSIGNEE_TPL = (
+    '<div style="display: flex; align-items: center; margin-top: 1rem;">'
+    '<div style="width: 32px; height: 32px; border-radius: 50%; '
+    f'background: {COLORS["primary_purple"]}; color: white; display: flex; '
+    'align-items: center; justify-content: center; margin-right: 0.5rem; font-weight: 600;">'
+    f'{{initial}}</div><span style="color: {COLORS["dark_gray"]};">{{name}}</span></div>'
+).format
+
+_METRIC_CARD_OPEN = '<div class="glass-card" style="position: relative; text-align: center; padding: 1rem;">'
+_METRIC_ICON_PREFIX = '<div style="position: absolute; right: 1rem; top: 1rem; font-size: 2rem; opacity: 0.2;">'
+_METRIC_VALUE_PREFIX = (
+    '<div style="font-size: 2.5rem; font-weight: 700; '
+    f'color: {COLORS["primary_purple"]}; margin: 0.5rem 0;">'
+)
+_METRIC_LABEL_PREFIX = f'<div style="color: {COLORS["dark_gray"]}; font-size: 1rem;">'
+
+# Delta opening tag (color + arrow), keyed by whether the delta is positive
+_DELTA_PREFIX = {
+    positive: f'<div style="color: {color}; font-size: 0.875rem; margin-top: 0.5rem;">{arrow}'
+    for positive, color, arrow in (
+        (True, COLORS['success'], '↑'),
+        (False, COLORS['danger'], '↓'),
+    )
+}
+
+# Notification type -> (color, icon)
+_NOTIFICATION_STYLES = {
+    "success": (COLORS['success'], "✓"),
+    "warning": (COLORS['warning'], "⚠"),
+    "error": (COLORS['danger'], "✕"),
+    "info": (COLORS['info'], "ℹ"),
+}
+
+@functools.lru_cache(maxsize=8)
+def _notification_frame(ntype):
+    """Opening/closing HTML for a notification type, with its color and icon baked in"""
+    color, icon = _NOTIFICATION_STYLES[ntype]
+    prefix = (
+        f'<div style="background: {color}20; border-left: 4px solid {color}; border-radius: 8px; '
+        'padding: 1rem 1.5rem; margin: 1rem 0; display: flex; align-items: center; '
+        'animation: fadeIn 0.5s ease;">'
+        f'<div style="width: 32px; height: 32px; border-radius: 50%; background: {color}; '
+        'color: white; display: flex; align-items: center; justify-content: center; '
+        f'margin-right: 1rem; font-weight: 700;">{icon}</div>'
+        f'<div style="color: {COLORS["dark_gray"]};">'
+    )
+    return prefix, '</div></div>'
+
+_LOGO_SVG: Final[str] = f"""
+<svg width="120" height="120" viewBox="0 0 120 120" xmlns="http://www.w3.org/2000/svg">
+    <rect width="120" height="120" rx="24" fill="url(#gradient)"/>
+    <defs>
+        <linearGradient id="gradient" x1="0%" y1="0%" x2="100%" y2="100%">
+            <stop offset="0%" style="stop-color:{COLORS['primary_purple']};stop-opacity:1" />
+            <stop offset="100%" style="stop-color:{COLORS['dark_purple']};stop-opacity:1" />
+        </linearGradient>
+    </defs>
+    <text x="50%" y="50%" text-anchor="middle" dy=".3em" 
+          font-family="Inter, sans-serif" font-size="48" font-weight="700" fill="white">
+        P
+    </text>
+    <text x="50%" y="75%" text-anchor="middle" 
+          font-family="Inter, sans-serif" font-size="12" font-weight="500" fill="white">
+        PREZLAB
+    </text>
+</svg>
+"""
+_LOGO_DATA_URI: Final[str] = "data:image/svg+xml;base64," + base64.b64encode(_LOGO_SVG.encode()).decode()
 
 def create_animated_header(title, subtitle=None):
     """Create an animated header with gradient text"""
@@ -401,20 +606,24 @@ def create_animated_header(title, subtitle=None):
 
 def create_glass_card(content, title=None, icon=None):
     """Create a glassmorphism card with content"""
-    # Create a container
-    with st.container():
-        # Add custom CSS class to this specific container
+    title_html = ''
+    if title:
+        heading = f"{icon} {title}" if icon else str(title)
+        title_html = f'<h3 style="margin: 0 0 1rem 0;">{html.escape(heading)}</h3>'
+    
+    # Plain text content: render the whole card in one element. Blank lines
+    # let the content itself still be parsed as markdown.
+    if isinstance(content, str):
         st.markdown(
-            f'<div class="glass-card-wrapper" style="padding: 1.5rem; margin: 1rem 0;">',
+            f'{_GLASS_CARD_OPEN}{title_html}\n\n{content}\n\n</div>',
             unsafe_allow_html=True
         )
-        
-        # Add title if provided
-        if title:
-            if icon:
-                st.markdown(f"### {icon} {title}")
-            else:
-                st.markdown(f"### {title}")
+        return
+    
+    # Create a container
+    with st.container():
+        # Add custom CSS class to this specific container
+        st.markdown(_GLASS_CARD_OPEN + title_html, unsafe_allow_html=True)
         
         # Execute the content
         if callable(content):
@@ -424,32 +633,17 @@ def create_glass_card(content, title=None, icon=None):
         
         # Close the wrapper
         st.markdown('</div>', unsafe_allow_html=True)
+
 def show_loading_with_progress(message, current_step=None, total_steps=None):
     """Show loading animation with optional progress"""
+    progress_html = ''
     if current_step and total_steps:
         progress = (current_step / total_steps) * 100
-        progress_html = f"""
-        <div style="text-align: center; padding: 2rem;">
-            <div class="loader"></div>
-            <p style="color: {COLORS['dark_gray']}; margin-top: 1rem;">{message}</p>
-            <div style="margin-top: 1rem;">
-                <div style="background: #e0e0e0; border-radius: 10px; overflow: hidden;">
-                    <div style="background: {COLORS['primary_purple']}; width: {progress}%; height: 6px;"></div>
-                </div>
-                <p style="color: {COLORS['dark_gray']}; font-size: 0.875rem; margin-top: 0.5rem;">
-                    Step {current_step} of {total_steps}
-                </p>
-            </div>
-        </div>
-        """
-    else:
-        progress_html = f"""
-        <div style="text-align: center; padding: 2rem;">
-            <div class="loader"></div>
-            <p style="color: {COLORS['dark_gray']}; margin-top: 1rem;">{message}</p>
-        </div>
-        """
-    return st.markdown(progress_html, unsafe_allow_html=True)
+        progress_html = (
+            f'{_LOADER_PROGRESS_OPEN}{progress}%; height: 6px;"></div></div>'
+            f'{_LOADER_STEP_OPEN}Step {current_step} of {total_steps}</p></div>'
+        )
+    return st.markdown(_LOADER_PREFIX + str(message) + '</p>' + progress_html + '</div>', unsafe_allow_html=True)
 
 def create_progress_steps(current_step, total_steps, step_labels):
     """Create a simple, clean progress indicator"""
@@ -463,184 +657,81 @@ def create_progress_steps(current_step, total_steps, step_labels):
     """
     st.markdown(progress_html, unsafe_allow_html=True)
     
-    # Step indicators using columns
-    cols = st.columns(total_steps)
-    for i, (col, label) in enumerate(zip(cols, step_labels)):
+    # Step indicators in a single flex row
+    steps_html = []
+    for i, label in enumerate(step_labels[:total_steps]):
         step_num = i + 1
-        is_complete = step_num < current_step
-        is_current = step_num == current_step
-        
-        with col:
-            if is_complete:
-                st.markdown(f"✅ **{label}**")
-            elif is_current:
-                st.markdown(f"🔵 **{label}**")
-            else:
-                st.markdown(f"⭕ {label}")
-
-def create_task_card(task_title, task_info, status="pending", assignee=None):
-    """Create an interactive task card"""
-    status_class = f"status-{status}"
-    status_text = status.capitalize()
+        label = html.escape(label)
+        if step_num < current_step:
+            steps_html.append(f'<div style="flex: 1;">✅ <strong>{label}</strong></div>')
+        elif step_num == current_step:
+            steps_html.append(f'<div style="flex: 1;">🔵 <strong>{label}</strong></div>')
+        else:
+            steps_html.append(f'<div style="flex: 1;">⭕ {label}</div>')
     
+    st.markdown(
+        '<div style="display: flex; justify-content: space-between; gap: 1rem;">'
+        + ''.join(steps_html) + '</div>',
+        unsafe_allow_html=True
+    )
+
+def _task_card_html(task_title, task_info, status="pending", assignee=None) -> str:
+    """Build the HTML for a task card."""
     assignee_html = ""
     if assignee:
-        assignee_html = f"""
-        <div style="display: flex; align-items: center; margin-top: 1rem;">
-            <div style="
-                width: 32px;
-                height: 32px;
-                border-radius: 50%;
-                background: {COLORS['primary_purple']};
-                color: white;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                margin-right: 0.5rem;
-                font-weight: 600;
-            ">{assignee[0].upper()}</div>
-            <span style="color: {COLORS['dark_gray']};">{assignee}</span>
-        </div>
-        """
+        assignee_html = _ASSIGNEE_TPL(initial=assignee[0].upper(), name=assignee)
     
-    card_html = f"""
-    <div class="task-card">
-        <div style="display: flex; justify-content: space-between; align-items: start;">
-            <h4 style="color: {COLORS['navy']}; margin: 0;">{task_title}</h4>
-            <span class="status-pill {status_class}">{status_text}</span>
-        </div>
-        <p style="color: {COLORS['dark_gray']}; margin: 0.5rem 0;">{task_info}</p>
-        {assignee_html}
-    </div>
-    """
-    st.markdown(card_html, unsafe_allow_html=True)
-
-def create_metric_card(label: str, value: str, delta: float = None, icon: str = None):
-    """Create a styled metric card with optional delta and icon."""
-    html_lines = []
-
-    # 1) Card container
-    html_lines.append(
-        '<div class="glass-card" '
-        'style="position: relative; text-align: center; padding: 1rem;">'
+    return (
+        _TASK_CARD_HEAD + str(task_title)
+        + '</h4>' + _status_pill(status) + '</div>'
+        + _TASK_CARD_INFO_OPEN + str(task_info) + '</p>'
+        + assignee_html + _TASK_CARD_TAIL
     )
 
-    # 2) Optional icon
-    if icon:
-        html_lines.append(
-            '<div style="'
-            'position: absolute; right: 1rem; top: 1rem; '
-            'font-size: 2rem; opacity: 0.2;">'
-            f'{icon}'
-            '</div>'
-        )
-
-    # 3) Value
-    html_lines.append(
-        '<div style="'
-        'font-size: 2.5rem; font-weight: 700; '
-        f"color: {COLORS['primary_purple']}; margin: 0.5rem 0;"
-        '">'
-        f'{value}'
-        '</div>'
-    )
+def create_task_card(task_title, task_info, status="pending", assignee=None):
+    """Create an interactive task card"""
+    st.markdown(_task_card_html(task_title, task_info, status, assignee), unsafe_allow_html=True)
 
-    # 4) Label
-    html_lines.append(
-        '<div style="'
-        f"color: {COLORS['dark_gray']}; font-size: 1rem;"
-        '">'
-        f'{label}'
-        '</div>'
-    )
+def _metric_card_html(label: str, value: str, delta: float = None, icon: str = None) -> str:
+    """Build the HTML for a metric card as a single string."""
+    icon_html = f'{_METRIC_ICON_PREFIX}{icon}</div>' if icon else ''
 
-    # 5) Optional delta
+    delta_html = ''
     if delta is not None:
-        delta_color = COLORS['success'] if delta > 0 else COLORS['danger']
-        delta_icon  = '↑' if delta > 0 else '↓'
-        html_lines.append(
-            '<div style="'
-            f"color: {delta_color}; font-size: 0.875rem; margin-top: 0.5rem;"
-            '">'
-            f'{delta_icon}{abs(delta)}%'
-            '</div>'
-        )
+        delta_html = f'{_DELTA_PREFIX[delta > 0]}{abs(delta)}%</div>'
 
-    # 6) Close container
-    html_lines.append('</div>')
+    return (
+        f'{_METRIC_CARD_OPEN}{icon_html}'
+        f'{_METRIC_VALUE_PREFIX}{value}</div>'
+        f'{_METRIC_LABEL_PREFIX}{label}</div>'
+        f'{delta_html}</div>'
+    )
 
-    # Join into one string with line-breaks (for readability in the browser)
-    card_html = "\n".join(html_lines)
+def create_metric_card(label: str, value: str, delta: float = None, icon: str = None):
+    """Create a styled metric card with optional delta and icon."""
+    st.markdown(_metric_card_html(label, value, delta, icon), unsafe_allow_html=True)
 
-    # Tell Streamlit to render it as HTML
-    st.markdown(card_html, unsafe_allow_html=True)
+def _render_metric_row(cards) -> str:
+    """Build one grid row of metric cards from (label, value, delta, icon) tuples."""
+    return (
+        f'<div style="display: grid; grid-template-columns: repeat({len(cards)}, 1fr); gap: 1rem;">'
+        + ''.join(_metric_card_html(*card) for card in cards)
+        + '</div>'
+    )
 
 def create_notification(message, type="info"):
     """Create an animated notification"""
-    colors = {
-        "success": COLORS['success'],
-        "warning": COLORS['warning'],
-        "error": COLORS['danger'],
-        "info": COLORS['info']
-    }
-    
-    icons = {
-        "success": "✓",
-        "warning": "⚠",
-        "error": "✕",
-        "info": "ℹ"
-    }
-    
-    notification_html = f"""
-    <div style="
-        background: {colors[type]}20;
-        border-left: 4px solid {colors[type]};
-        border-radius: 8px;
-        padding: 1rem 1.5rem;
-        margin: 1rem 0;
-        display: flex;
-        align-items: center;
-        animation: fadeIn 0.5s ease;
-    ">
-        <div style="
-            width: 32px;
-            height: 32px;
-            border-radius: 50%;
-            background: {colors[type]};
-            color: white;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            margin-right: 1rem;
-            font-weight: 700;
-        ">{icons[type]}</div>
-        <div style="color: {COLORS['dark_gray']};">{message}</div>
-    </div>
-    """
+    prefix, suffix = _notification_frame(type)
+    notification_html = prefix + str(message) + suffix
     st.markdown(notification_html, unsafe_allow_html=True)
 
 def get_prezlab_logo_svg():
     """Generate a PrezLab logo SVG"""
-    logo_svg = f"""
-    <svg width="120" height="120" viewBox="0 0 120 120" xmlns="http://www.w3.org/2000/svg">
-        <rect width="120" height="120" rx="24" fill="url(#gradient)"/>
-        <defs>
-            <linearGradient id="gradient" x1="0%" y1="0%" x2="100%" y2="100%">
-                <stop offset="0%" style="stop-color:{COLORS['primary_purple']};stop-opacity:1" />
-                <stop offset="100%" style="stop-color:{COLORS['dark_purple']};stop-opacity:1" />
-            </linearGradient>
-        </defs>
-        <text x="50%" y="50%" text-anchor="middle" dy=".3em" 
-              font-family="Inter, sans-serif" font-size="48" font-weight="700" fill="white">
-            P
-        </text>
-        <text x="50%" y="75%" text-anchor="middle" 
-              font-family="Inter, sans-serif" font-size="12" font-weight="500" fill="white">
-            PREZLAB
-        </text>
-    </svg>
-    """
-    return logo_svg
+    return _LOGO_SVG
+
+def get_prezlab_logo_data_uri():
+    """PrezLab logo as a data: URI, for use in <img src="...">"""
+    return _LOGO_DATA_URI
 
 def create_floating_action_button(icon="➕"):
     """Create a floating action button"""
@@ -651,28 +742,28 @@ def create_floating_action_button(icon="➕"):
     """
     st.markdown(fab_html, unsafe_allow_html=True)
 
-def create_interactive_dashboard():
-    """Create an interactive dashboard with metrics"""
-    # Inject the enhanced CSS
-    inject_enhanced_css()
+def create_interactive_dashboard(inject_css=True):
+    """Create an interactive dashboard with metrics
+    
+    Pass inject_css=False when the page has already called inject_enhanced_css
+    in this run, to avoid sending the stylesheet twice.
+    """
+    if inject_css:
+        inject_enhanced_css(components=("fab", "task_card"))
     
     # Header
     create_animated_header("Task Management Dashboard", "Welcome back! Here's your overview")
     
-    # Metrics Row
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        create_metric_card("Active Tasks", "12", delta=8, icon="📋")
-    
-    with col2:
-        create_metric_card("Completed", "45", delta=15, icon="✅")
-    
-    with col3:
-        create_metric_card("Designers", "8", icon="👥")
-    
-    with col4:
-        create_metric_card("On Time", "92%", delta=5, icon="⏱️")
+    # Metrics Row (one element instead of four columns)
+    st.markdown(
+        _render_metric_row([
+            ("Active Tasks", "12", 8, "📋"),
+            ("Completed", "45", 15, "✅"),
+            ("Designers", "8", None, "👥"),
+            ("On Time", "92%", 5, "⏱️"),
+        ]),
+        unsafe_allow_html=True
+    )
     
     # Recent Tasks Section
     st.markdown("<br>", unsafe_allow_html=True)
@@ -683,18 +774,20 @@ def create_interactive_dashboard():
     )
     
     # Task Cards
-    create_task_card(
-        "PowerPoint Presentation - Q4 Results",
-        "Due: Tomorrow • Client: ABC Corp • 15 slides",
-        status="active",
-        assignee="John Designer"
-    )
-    
-    create_task_card(
-        "Brand Guidelines Document",
-        "Due: Next Week • Client: XYZ Ltd • Arabic & English",
-        status="pending",
-        assignee="Sarah Creative"
+    st.markdown(
+        _task_card_html(
+            "PowerPoint Presentation - Q4 Results",
+            "Due: Tomorrow • Client: ABC Corp • 15 slides",
+            status="active",
+            assignee="John Designer"
+        )
+        + _task_card_html(
+            "Brand Guidelines Document",
+            "Due: Next Week • Client: XYZ Ltd • Arabic & English",
+            status="pending",
+            assignee="Sarah Creative"
+        ),
+        unsafe_allow_html=True
     )
     
     # Floating Action Button
@@ -703,44 +796,18 @@ def create_interactive_dashboard():
 # Utility function to create a loading animation
 def show_loading_animation(message="Loading..."):
     """Show a custom loading animation"""
-    loading_html = f"""
-    <div style="text-align: center; padding: 2rem;">
-        <div class="loader"></div>
-        <p style="color: {COLORS['dark_gray']}; margin-top: 1rem;">{message}</p>
-    </div>
-    """
-    return st.markdown(loading_html, unsafe_allow_html=True)
+    return st.markdown(_LOADER_PREFIX + str(message) + _LOADER_SUFFIX, unsafe_allow_html=True)
 
 # Function to animate numbers
 def animate_number(start, end, duration=1000, prefix="", suffix=""):
-    """Create an animated number counter"""
-    counter_id = f"counter_{hash(str(end))}"
-    script = f"""
-    <div id="{counter_id}" style="
-        font-size: 2.5rem;
-        font-weight: 700;
-        color: {COLORS['primary_purple']};
-    ">{prefix}{start}{suffix}</div>
-    
-    <script>
-    (function() {{
-        let current = {start};
-        const target = {end};
-        const increment = (target - current) / ({duration} / 16);
-        const counter = document.getElementById('{counter_id}');
-        
-        const timer = setInterval(() => {{
-            current += increment;
-            if ((increment > 0 && current >= target) || (increment < 0 && current <= target)) {{
-                current = target;
-                clearInterval(timer);
-            }}
-            counter.textContent = '{prefix}' + Math.round(current) + '{suffix}';
-        }}, 16);
-    }})();
-    </script>
-    """
-    st.markdown(script, unsafe_allow_html=True)
+    """Create an animated number counter (CSS-only; needs the "counter" sheet)"""
+    counter_html = (
+        '<div class="animated-counter">'
+        f'{prefix}<span class="counter-value" style="--counter-from: {round(start)}; '
+        f'--counter-to: {round(end)}; --counter-duration: {duration}ms;"></span>{suffix}'
+        '</div>'
+    )
+    st.markdown(counter_html, unsafe_allow_html=True)
 
 # Enhanced form styling
 def style_form_container():
@@ -749,8 +816,7 @@ def style_form_container():
     <style>
     /* Enhanced Form Styling */
     [data-testid="stForm"] {{
-        background: rgba(255, 255, 255, 0.9);
-        backdrop-filter: blur(10px);
+        background: rgba(255, 255, 255, 0.92);
         border-radius: 20px;
         padding: 2rem;
         box-shadow: 0 8px 32px 0 rgba(128, 90, 249, 0.1);
@@ -1,12 +1,18 @@
 import base64
+import io
 import logging
-from typing import List, Dict, Optional, Any
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from googleapiclient.errors import HttpError
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
+from googleapiclient.http import MediaIoBaseUpload
+import google_auth_httplib2
+import httplib2
+from email.message import EmailMessage
+from email.utils import parsedate_to_datetime
+from operator import itemgetter
 import os
+import streamlit as st
 
 # Configure logging
 logging.basicConfig(
@@ -16,107 +22,347 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Largest page Gmail's messages().list() returns
+LIST_PAGE_SIZE = 500
+# Gmail accepts up to 100 calls per batch, but larger batches are more likely to be rate limited
+BATCH_SIZE = 50
+# Retries, with exponential backoff and jitter, for rate-limited (429) or 5xx read calls
+API_RETRIES = 5
+# Concurrent single-message gets used when a batch call fails
+FALLBACK_WORKERS = 10
+# Messages with attachments up to this size are sent base64-encoded inside the JSON
+# request; larger ones go as a resumable media upload of the raw message
+ATTACHMENT_INLINE_LIMIT = 5 * 1024 * 1024
+# Maximum number of parsed emails kept in the per-session message cache
+MESSAGE_CACHE_SIZE = 5000
+# Headers requested when the message body is not needed
+METADATA_HEADERS = ["Subject", "From", "Date"]
+_WANTED_HEADERS = frozenset(name.lower() for name in METADATA_HEADERS)
+# Partial-response masks limiting messages().get() to the fields _parse_message reads
+METADATA_MESSAGE_FIELDS = "id,threadId,snippet,payload/headers"
+FULL_MESSAGE_FIELDS = "id,threadId,snippet,payload(mimeType,headers,body/data,parts)"
+
+# Per-thread HTTP clients for concurrent fetches
+_thread_local = threading.local()
+
 def get_gmail_service():
     """Get an authenticated Gmail service"""
     from google_auth import get_google_service
     return get_google_service('gmail')
 
-def fetch_recent_emails(service, total_emails=50, query=""):
+class _EmailDict(dict):
+    """Email details dict that decodes the base64 body on first access to "body"."""
+    
+    def __missing__(self, key):
+        if key != "body":
+            raise KeyError(key)
+        body_data = self.pop("_raw_body", "")
+        # Decoding happens in the caller's code path, so a stray non-UTF-8 byte must not raise
+        body = base64.urlsafe_b64decode(body_data).decode("utf-8", errors="replace") if body_data else ""
+        self["body"] = body
+        return body
+    
+    def get(self, key, default=None):
+        if key == "body" and "_raw_body" in self:
+            return self["body"]
+        return super().get(key, default)
+
+def _extract_headers(headers):
+    """Maps the lower-cased names of the headers the app uses to their first value"""
+    header_map = {}
+    for h in headers:
+        name = h["name"].lower()
+        if name in _WANTED_HEADERS and name not in header_map:
+            header_map[name] = h["value"]
+            if len(header_map) == len(_WANTED_HEADERS):
+                break
+    return header_map
+
+def _date_timestamp(date):
+    """Converts an RFC 2822 Date header to a POSIX timestamp (0.0 when missing or malformed)"""
+    if not date:
+        return 0.0
+    try:
+        return parsedate_to_datetime(date).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+def _walk_parts(part):
+    """Yields a MIME part and all of its nested parts, depth first"""
+    yield part
+    for child in part.get("parts", ()):
+        yield from _walk_parts(child)
+
+def _parse_message(msg_data):
     """
-    Fetches recent emails from Gmail inbox.
+    Converts a Gmail API message resource into the email dict used by the app.
     
     Args:
-        service: Gmail API service object
-        total_emails: Maximum number of emails to fetch
-        query: Gmail search query string (e.g. "from:example@gmail.com")
+        msg_data: Message resource returned by messages().get()
         
     Returns:
-        List of email details including id, subject, sender, and snippet
+        Dictionary with id, threadId, subject, from, date, snippet, body
+        (decoded lazily) and _ts (the parsed date as a timestamp, for sorting)
     """
-    if not service:
-        logger.error("Gmail service not initialized")
-        return []
+    snippet = msg_data.get("snippet", "")
+    headers = msg_data["payload"].get("headers", [])
+    
+    # Extract subject and sender from headers
+    header_map = _extract_headers(headers)
+    subject = header_map.get("subject")
+    sender = header_map.get("from")
+    date = header_map.get("date")
+    
+    # Locate the encoded message body (simple extraction, may need enhancement for complex emails);
+    # it is only decoded once something reads email["body"]
+    payload = msg_data["payload"]
+    if "parts" in payload:
+        body_data = next(
+            (part["body"]["data"] for part in _walk_parts(payload)
+             if part.get("mimeType") == "text/plain" and part.get("body", {}).get("data")),
+            ""
+        )
+    else:
+        body_data = payload.get("body", {}).get("data", "")
+    
+    return _EmailDict({
+        "id": msg_data["id"],
+        "threadId": msg_data.get("threadId", ""),
+        "subject": subject,
+        "from": sender,
+        "date": date,
+        "_ts": _date_timestamp(date),
+        "snippet": snippet,
+        "_raw_body": body_data
+    })
+
+def _get_message_request(service, message_id, include_body=True):
+    """Builds the messages().get() request, asking only for headers when the body is not needed"""
+    if include_body:
+        return service.users().messages().get(
+            userId="me", id=message_id, format="full", fields=FULL_MESSAGE_FIELDS
+        )
+    return service.users().messages().get(
+        userId="me", id=message_id, format="metadata", metadataHeaders=METADATA_HEADERS,
+        fields=METADATA_MESSAGE_FIELDS
+    )
+
+def _message_cache():
+    """Returns this session's LRU of parsed emails, keyed by (message ID, include_body)"""
+    return st.session_state.setdefault("_gmail_msg_cache", OrderedDict())
+
+def _cached_messages(cache, message_ids, include_body):
+    """
+    Looks up already fetched emails in the message cache.
+    
+    Args:
+        cache: OrderedDict returned by _message_cache()
+        message_ids: IDs to look up
+        include_body: Whether the caller needs bodies; full entries also
+            satisfy metadata-only lookups
+        
+    Returns:
+        Dictionary mapping the IDs found to their email dicts
+    """
+    variants = (True,) if include_body else (False, True)
+    found = {}
+    for message_id in message_ids:
+        for has_body in variants:
+            key = (message_id, has_body)
+            if key in cache:
+                cache.move_to_end(key)
+                found[message_id] = cache[key]
+                break
+    return found
+
+def _store_messages(cache, emails_by_id, include_body):
+    """Adds freshly fetched emails to the message cache, evicting the least recently used"""
+    for message_id, email in emails_by_id.items():
+        cache[(message_id, include_body)] = email
+    while len(cache) > MESSAGE_CACHE_SIZE:
+        cache.popitem(last=False)
+
+def _list_params(total, query="", page_token=None):
+    """Builds messages().list() parameters for up to total IDs"""
+    params = {
+        "userId": "me", 
+        "maxResults": min(LIST_PAGE_SIZE, total),
+        # threadId comes back with each message get, so the listing only needs IDs
+        "fields": "messages/id,nextPageToken"
+    }
+    
+    if query:
+        params["q"] = query
+        
+    if page_token:
+        params["pageToken"] = page_token
     
-    emails = []
-    next_page_token = None
+    return params
+
+def _list_message_page(service, params):
+    """Runs one messages().list() call on the calling thread's HTTP connection"""
+    http = _thread_http(service._http.credentials)
+    return service.users().messages().list(**params).execute(http=http, num_retries=API_RETRIES)
+
+def _iter_message_id_pages(service, total_emails, query=""):
+    """
+    Lists message IDs matching a query, one page at a time. The first page is
+    listed on the calling thread; when more pages are needed, each next one is
+    requested in the background while the caller processes the current one.
+    
+    Args:
+        service: Gmail API service object
+        total_emails: Maximum number of IDs to list
+        query: Gmail search query string
+        
+    Yields:
+        Lists of message IDs, newest first
+    """
+    listed = 0
+    # Created only once a second page is needed; a single worker keeps at most
+    # one list request in flight
+    prefetcher = None
     
     try:
-        logger.info(f"Fetching up to {total_emails} emails" + (f" with query: {query}" if query else ""))
-        
-        # Fetch email IDs first
-        while len(emails) < total_emails:
-            params = {
-                "userId": "me", 
-                "maxResults": min(50, total_emails - len(emails))
-            }
-            
-            if query:
-                params["q"] = query
-                
-            if next_page_token:
-                params["pageToken"] = next_page_token
-                
-            result = service.users().messages().list(**params).execute()
+        result = service.users().messages().list(
+            **_list_params(total_emails, query)
+        ).execute(num_retries=API_RETRIES)
+        
+        while True:
             messages = result.get("messages", [])
             
             if not messages:
                 logger.info("No more messages found")
                 break
-                
-            emails.extend(messages)
+            
+            listed += len(messages)
             next_page_token = result.get("nextPageToken")
+            pending = None
             
             if not next_page_token:
                 logger.info("No next page token, reached end of results")
+            elif listed < total_emails:
+                if prefetcher is None:
+                    prefetcher = ThreadPoolExecutor(max_workers=1)
+                pending = prefetcher.submit(
+                    _list_message_page, service,
+                    _list_params(total_emails - listed, query, next_page_token)
+                )
+            
+            yield [msg["id"] for msg in messages]
+            
+            if pending is None:
                 break
+            result = pending.result()
+    finally:
+        if prefetcher is not None:
+            prefetcher.shutdown()
+
+def _fetch_message_chunk(service, message_ids, include_body, cache):
+    """
+    Fetches details for up to BATCH_SIZE messages, using the session cache,
+    one batch request and the concurrent fallback for anything that failed.
+    
+    Args:
+        service: Gmail API service object
+        message_ids: IDs of the messages to fetch
+        include_body: Whether to fetch full messages or only their headers
+        cache: OrderedDict returned by _message_cache()
         
-        logger.info(f"Found {len(emails)} email IDs")
+    Returns:
+        List of parsed email dicts in the order of message_ids (failures are skipped)
+    """
+    # Delivered messages never change, so reuse details fetched earlier in this session
+    results = _cached_messages(cache, message_ids, include_body)
+    missing_ids = [mid for mid in message_ids if mid not in results]
+    
+    if missing_ids:
+        # Batch the gets into a single HTTP call
+        failed_ids = []
         
-        # Now retrieve full details for each email
-        detailed_emails = []
-        for i, msg in enumerate(emails):
+        def _on_message(request_id, response, exception):
+            if exception is not None:
+                logger.warning(f"Batch fetch failed for email {request_id}: {exception}")
+                failed_ids.append(request_id)
+                return
             try:
-                msg_data = service.users().messages().get(userId="me", id=msg["id"]).execute()
-                
-                # Extract email details
-                snippet = msg_data.get("snippet", "")
-                headers = msg_data["payload"].get("headers", [])
-                
-                # Extract subject and sender from headers
-                subject = next((h["value"] for h in headers if h["name"].lower() == "subject"), None)
-                sender = next((h["value"] for h in headers if h["name"].lower() == "from"), None)
-                date = next((h["value"] for h in headers if h["name"].lower() == "date"), None)
-                
-                # Extract message body (simple extraction, may need enhancement for complex emails)
-                body = ""
-                if "parts" in msg_data["payload"]:
-                    for part in msg_data["payload"]["parts"]:
-                        if part["mimeType"] == "text/plain":
-                            body_data = part["body"].get("data", "")
-                            if body_data:
-                                body = base64.urlsafe_b64decode(body_data).decode("utf-8")
-                                break
-                elif "body" in msg_data["payload"] and "data" in msg_data["payload"]["body"]:
-                    body_data = msg_data["payload"]["body"]["data"]
-                    body = base64.urlsafe_b64decode(body_data).decode("utf-8")
-                
-                detailed_emails.append({
-                    "id": msg["id"],
-                    "subject": subject,
-                    "from": sender,
-                    "date": date,
-                    "snippet": snippet,
-                    "body": body
-                })
-                
-                # Log progress for long operations
-                if (i+1) % 10 == 0:
-                    logger.info(f"Processed {i+1}/{len(emails)} emails")
-                
+                results[request_id] = _parse_message(response)
             except Exception as e:
-                logger.error(f"Error fetching details for email {msg['id']}: {e}")
-                # Continue with next email
+                logger.error(f"Error parsing email {request_id}: {e}")
+        
+        batch = service.new_batch_http_request(callback=_on_message)
+        for message_id in missing_ids:
+            batch.add(
+                _get_message_request(service, message_id, include_body),
+                request_id=message_id
+            )
+        try:
+            batch.execute()
+        except (HttpError, httplib2.HttpLib2Error, OSError) as error:
+            # The whole batch call failed (a transient 5xx, a proxy that mangles multipart
+            # responses, a dropped connection); retry its messages individually
+            logger.warning(f"Batch request failed, falling back to individual gets: {error}")
+            failed_ids.extend(mid for mid in missing_ids if mid not in results and mid not in failed_ids)
+        
+        if failed_ids:
+            logger.info(f"Retrying {len(failed_ids)} emails with concurrent gets")
+            for message_id, email in zip(failed_ids, _fetch_messages_concurrently(service, failed_ids, include_body)):
+                if email is not None:
+                    results[message_id] = email
+        
+        _store_messages(cache, {mid: results[mid] for mid in missing_ids if mid in results}, include_body)
+    
+    # Preserve the order returned by messages().list
+    return [results[mid] for mid in message_ids if mid in results]
+
+def iter_recent_emails(service, total_emails=50, query="", include_body=True):
+    """
+    Yields recent emails as soon as each batch of details arrives, so callers
+    can show progress instead of waiting for the whole listing.
+    
+    Args:
+        service: Gmail API service object
+        total_emails: Maximum number of emails to fetch
+        query: Gmail search query string (e.g. "from:example@gmail.com")
+        include_body: Whether to download message bodies
+        
+    Yields:
+        Email details dicts, newest first
+        
+    Raises:
+        HttpError: If listing the messages fails
+    """
+    logger.info(f"Fetching up to {total_emails} emails" + (f" with query: {query}" if query else ""))
+    
+    cache = _message_cache()
+    fetched = 0
+    for message_ids in _iter_message_id_pages(service, total_emails, query):
+        for start in range(0, len(message_ids), BATCH_SIZE):
+            emails = _fetch_message_chunk(service, message_ids[start:start + BATCH_SIZE], include_body, cache)
+            fetched += len(emails)
+            logger.info(f"Fetched details for {fetched} emails")
+            yield from emails
+
+def fetch_recent_emails(service, total_emails=50, query="", include_body=True):
+    """
+    Fetches recent emails from Gmail inbox.
+    
+    Args:
+        service: Gmail API service object
+        total_emails: Maximum number of emails to fetch
+        query: Gmail search query string (e.g. "from:example@gmail.com")
+        include_body: Whether to download message bodies; when False only
+            the Subject/From/Date headers are fetched and body is empty
         
+    Returns:
+        List of email details including id, subject, sender, and snippet
+    """
+    if not service:
+        logger.error("Gmail service not initialized")
+        return []
+    
+    try:
+        detailed_emails = list(iter_recent_emails(service, total_emails, query, include_body))
         logger.info(f"Successfully fetched details for {len(detailed_emails)} emails")
         return detailed_emails
         
@@ -127,7 +373,82 @@ def fetch_recent_emails(service, total_emails=50, query=""):
         logger.error(f"Error fetching emails: {e}", exc_info=True)
         return []
 
-# Keep all other existing functions like send_email, get_email_labels, search_emails, etc.
+def _thread_http(credentials):
+    """
+    Returns this thread's authorized HTTP client, creating it on first use.
+    
+    httplib2 connections are not thread-safe, so each worker thread keeps its
+    own; reusing it across calls keeps the TLS connection alive between gets.
+    """
+    http = getattr(_thread_local, "http", None)
+    if http is None or http.credentials is not credentials:
+        http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=30))
+        _thread_local.http = http
+    return http
+
+def _fetch_one(service, message_id, include_body=True):
+    """
+    Fetches and parses a single message on the calling thread's HTTP connection.
+    
+    Args:
+        service: Gmail API service object
+        message_id: ID of the message to fetch
+        include_body: Whether to fetch the full message or only its headers
+        
+    Returns:
+        Parsed email dict, or None if the fetch failed
+    """
+    try:
+        http = _thread_http(service._http.credentials)
+        msg_data = _get_message_request(service, message_id, include_body).execute(
+            http=http, num_retries=API_RETRIES
+        )
+        return _parse_message(msg_data)
+    except Exception as e:
+        logger.error(f"Error fetching details for email {message_id}: {e}")
+        return None
+
+def _fetch_messages_concurrently(service, message_ids, include_body=True, max_workers=FALLBACK_WORKERS):
+    """
+    Fetches several messages in parallel, one get() per message.
+    
+    Args:
+        service: Gmail API service object
+        message_ids: IDs of the messages to fetch
+        include_body: Whether to fetch full messages or only their headers
+        max_workers: Maximum number of concurrent requests
+        
+    Returns:
+        List of parsed email dicts (None for failures), in the order of message_ids
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda mid: _fetch_one(service, mid, include_body), message_ids))
+
+def _send_raw(service, message):
+    """Encodes a built message and sends it through the Gmail API"""
+    raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
+    
+    sent = service.users().messages().send(
+        userId="me", 
+        body={'raw': raw_message}
+    ).execute()
+    
+    logger.info(f"Email sent successfully (Message ID: {sent['id']})")
+    return True
+
+def _send_upload(service, message):
+    """Sends a large built message as a resumable media upload instead of base64 inside JSON"""
+    media = MediaIoBaseUpload(io.BytesIO(message.as_bytes()), mimetype='message/rfc822', resumable=True)
+    
+    sent = service.users().messages().send(
+        userId="me", 
+        body={},
+        media_body=media
+    ).execute()
+    
+    logger.info(f"Email sent successfully (Message ID: {sent['id']})")
+    return True
+
 def send_email(service, to, subject, body, cc=None, bcc=None, attachment_path=None):
     """
     Sends an email using Gmail API.
@@ -149,44 +470,36 @@ def send_email(service, to, subject, body, cc=None, bcc=None, attachment_path=No
         return False
     
     try:
-        # Create message
-        message = MIMEMultipart()
+        message = EmailMessage()
         message['to'] = to
         message['subject'] = subject
-        
         if cc:
             message['cc'] = cc
         if bcc:
             message['bcc'] = bcc
-            
-        # Add body
-        message.attach(MIMEText(body))
+        message.set_content(body)
         
-        # Add attachment if provided
-        if attachment_path and os.path.exists(attachment_path):
-            content_type, encoding = 'application/octet-stream', None
-            main_type, sub_type = content_type.split('/', 1)
-            
-            with open(attachment_path, 'rb') as file:
-                attachment = MIMEBase(main_type, sub_type)
-                attachment.set_payload(file.read())
-                
-            encoders.encode_base64(attachment)
-            filename = os.path.basename(attachment_path)
-            attachment.add_header('Content-Disposition', f'attachment; filename={filename}')
-            message.attach(attachment)
-            
-        # Encode message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
+        if not attachment_path:
+            return _send_raw(service, message)
+        
+        try:
+            file = open(attachment_path, 'rb')
+        except FileNotFoundError:
+            logger.warning(f"Attachment not found, sending without it: {attachment_path}")
+            return _send_raw(service, message)
         
-        # Send message
-        message = service.users().messages().send(
-            userId="me", 
-            body={'raw': raw_message}
-        ).execute()
+        with file:
+            size = os.fstat(file.fileno()).st_size
+            message.add_attachment(
+                file.read(), maintype='application', subtype='octet-stream',
+                filename=os.path.basename(attachment_path)
+            )
         
-        logger.info(f"Email sent successfully (Message ID: {message['id']})")
-        return True
+        # Only the transport depends on the size: large messages skip the extra
+        # base64 layer and JSON body of a raw send
+        if size > ATTACHMENT_INLINE_LIMIT:
+            return _send_upload(service, message)
+        return _send_raw(service, message)
         
     except HttpError as error:
         logger.error(f"HTTP error sending email: {error}", exc_info=True)
@@ -205,17 +518,16 @@ def extract_email_threads(emails):
     Returns:
         Dictionary mapping thread IDs to lists of emails
     """
-    threads = {}
+    threads = defaultdict(list)
     
     for email in emails:
         thread_id = email.get("threadId", "")
         if thread_id:
-            if thread_id not in threads:
-                threads[thread_id] = []
             threads[thread_id].append(email)
     
     # Sort emails within each thread by date
-    for thread_id in threads:
-        threads[thread_id].sort(key=lambda x: x.get("date", ""), reverse=True)
+    by_timestamp = itemgetter("_ts")
+    for thread in threads.values():
+        thread.sort(key=by_timestamp, reverse=True)
     
-    return threads
\ No newline at end of file
+    return dict(threads)
\ No newline at end of file
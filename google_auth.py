@@ -1,31 +1,232 @@
-import os
 import json
+import functools
+import hashlib
+import threading
 import logging
-import tempfile
+from urllib.parse import urlencode
+from logging.handlers import RotatingFileHandler
+import requests
 import streamlit as st
 import time
+from datetime import datetime, timedelta
+from cachetools import TTLCache
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.model import JsonModel
 from config import get_secret, get_google_credentials
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    filename='google_auth.log'
-)
+# Configure logging: a size-capped file that is only opened on the first write
 logger = logging.getLogger(__name__)
+if not logger.handlers:
+    _log_handler = RotatingFileHandler('google_auth.log', maxBytes=1_000_000, backupCount=3, delay=True)
+    _log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(_log_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
 
 # Define consistent scopes for all Google services
-SCOPES = [
+SCOPES = (
     'https://www.googleapis.com/auth/gmail.readonly', 
     'https://www.googleapis.com/auth/gmail.send',
     'https://www.googleapis.com/auth/drive.file'
-]
+)
+
+# Redirect URI registered for the deployed app; the callback must use the same one
+OAUTH_REDIRECT_URI = "https://prezlab-tms.streamlit.app/"
+
+# Refresh access tokens this long before they expire, so API calls made during a
+# rerun never start with a token that runs out mid-request
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Discovery API version for each supported service
+API_VERSIONS = {
+    'gmail': 'v1',
+    'drive': 'v3'
+}
+
+# Faster JSON decoding of API responses when orjson is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class _OrjsonModel(JsonModel):
+    """JsonModel that parses response bodies with orjson, falling back to the stdlib parser."""
+    
+    def deserialize(self, content):
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return super().deserialize(content)
+        if self._data_wrapper and isinstance(body, dict) and "data" in body:
+            body = body["data"]
+        return body
+
+@st.cache_resource(show_spinner=False, ttl=3300)
+def _build_service(service_name, api_version, token, _creds):
+    """
+    Builds a Google API client once per access token instead of on every rerun.
+    
+    Args:
+        service_name: Name of the service ('gmail' or 'drive')
+        api_version: Discovery API version of the service
+        token: Current access token, used as the cache key
+        _creds: Credentials to authorize the client with (not hashed)
+        
+    Returns:
+        Service object
+    """
+    # Use the discovery documents bundled with googleapiclient and skip its file cache
+    return build(service_name, api_version, credentials=_creds,
+                 static_discovery=True, cache_discovery=False,
+                 model=_OrjsonModel() if orjson else None)
+
+def _session_service(service_name, creds):
+    """
+    Returns the service this session last built for the same access token,
+    building (through the process-wide cache) only when the token changed.
+    
+    Args:
+        service_name: Name of the service ('gmail' or 'drive')
+        creds: Valid credentials for the service
+        
+    Returns:
+        Service object
+    """
+    svc_key = f"google_{service_name}_service"
+    cached = st.session_state.get(svc_key)
+    if cached and cached[0] == creds.token:
+        return cached[1]
+    
+    service = _build_service(service_name, API_VERSIONS.get(service_name, 'v1'), creds.token, creds)
+    st.session_state[svc_key] = (creds.token, service)
+    return service
+
+def _credentials_to_dict(creds):
+    """Converts credentials to the authorized-user JSON document stored by token_storage"""
+    return json.loads(creds.to_json())
+
+def _credentials_from_dict(token_data):
+    """
+    Rebuilds credentials from a token document saved by _credentials_to_dict.
+    
+    Args:
+        token_data: Dict with token, refresh_token, client_id, client_secret,
+            token_uri, scopes and (for tokens saved since it was added) expiry
+        
+    Returns:
+        Credentials object
+    """
+    from google.oauth2.credentials import Credentials
+    return Credentials.from_authorized_user_info(token_data)
+
+# Access tokens obtained in the last few seconds, keyed by a hash of their refresh token
+_recent_refreshes = TTLCache(maxsize=256, ttl=30)
+# One lock per refresh key, held across that token's refresh call, with a count of the
+# threads using it so the entry can be dropped afterwards. The guard only protects these
+# two structures and is never held during network I/O.
+_refresh_locks = {}
+_refresh_locks_guard = threading.Lock()
+
+def _acquire_refresh_lock(refresh_key):
+    """Returns the lock for refresh_key (not yet acquired), registering this thread as a user"""
+    with _refresh_locks_guard:
+        entry = _refresh_locks.setdefault(refresh_key, [threading.Lock(), 0])
+        entry[1] += 1
+        return entry[0]
+
+def _release_refresh_lock(refresh_key):
+    """Unregisters a user of refresh_key's lock, dropping the lock once nobody holds it"""
+    with _refresh_locks_guard:
+        entry = _refresh_locks[refresh_key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _refresh_locks[refresh_key]
+
+# One pooled HTTP session for all calls to Google's token endpoint, so refreshes and
+# code exchanges reuse kept-alive TLS connections instead of opening new ones
+_token_http = requests.Session()
+_token_request = Request(session=_token_http)
+
+def _needs_refresh(creds):
+    """True if the credentials can be refreshed and are invalid or close to expiry"""
+    if not getattr(creds, 'refresh_token', None):
+        return False
+    if not creds.valid:
+        return True
+    # google-auth stores expiry as a naive UTC datetime
+    return creds.expiry is not None and creds.expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN
+
+def _refresh_credentials(creds, username=None, token_service=None):
+    """
+    Refreshes invalid or nearly expired credentials and persists the new token.
+    
+    Args:
+        creds: Credentials to check and refresh in place
+        username: Logged-in username to save the refreshed token for (optional)
+        token_service: token_storage service key, e.g. 'google_gmail'
+        
+    Returns:
+        True if a refresh happened, False if the token was still valid
+    """
+    if not _needs_refresh(creds):
+        return False
+    
+    # Sessions holding the same refresh token (Gmail and Drive copies, several tabs)
+    # reuse one refresh instead of each calling Google and racing on token rotation
+    refresh_key = hashlib.sha256(creds.refresh_token.encode()).hexdigest()
+    lock = _acquire_refresh_lock(refresh_key)
+    try:
+        with lock:
+            with _refresh_locks_guard:
+                recent = _recent_refreshes.get(refresh_key)
+            if recent and recent[1] and recent[1] - datetime.utcnow() > TOKEN_REFRESH_MARGIN:
+                creds.token, creds.expiry = recent
+            else:
+                creds.refresh(_token_request)
+                with _refresh_locks_guard:
+                    _recent_refreshes[refresh_key] = (creds.token, creds.expiry)
+    finally:
+        _release_refresh_lock(refresh_key)
+    
+    if username and token_service:
+        try:
+            from token_storage import save_user_token_async
+        except ImportError:
+            logger.warning("token_storage module not available, refreshed token not persisted")
+        else:
+            save_user_token_async(username, token_service, _credentials_to_dict(creds))
+    return True
+
+@functools.lru_cache(maxsize=4)
+def _auth_url_base(client_id, auth_uri, redirect_uri):
+    """
+    Builds the consent-screen URL (without state) that InstalledAppFlow.authorization_url
+    would produce, so unauthenticated reruns do not construct a flow and its HTTP session.
+    
+    Args:
+        client_id: OAuth client ID
+        auth_uri: Authorization endpoint from the client config
+        redirect_uri: Redirect URI registered for the client
+        
+    Returns:
+        URL string to which a state parameter is appended
+    """
+    params = {
+        'response_type': 'code',
+        'client_id': client_id,
+        'redirect_uri': redirect_uri,
+        'scope': ' '.join(SCOPES),
+        'access_type': 'offline',
+        'prompt': 'consent',
+        'include_granted_scopes': 'true',
+    }
+    return f"{auth_uri}?{urlencode(params)}"
 
+@functools.lru_cache(maxsize=1)
 def is_running_locally():
-    """Definitive check for local environment"""
+    """Definitive check for local environment (secrets are read once per process)"""
     local_auth = st.secrets.get('LOCAL_AUTH', 'False')
     return local_auth.lower() == 'true'
 
@@ -54,21 +255,19 @@ def get_google_service(service_name):
     Returns:
         Service object or None if authentication fails
     """
-    import json
+    # Fast path: this session already built the service for a token that is still good
+    creds = st.session_state.get(f"google_{service_name}_creds")
+    cached = st.session_state.get(f"google_{service_name}_service")
+    if cached and creds and cached[0] == creds.token and creds.valid and not _needs_refresh(creds):
+        return cached[1]
+    
     import uuid
-    import tempfile
-    import os
-    from google.auth.transport.requests import Request
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google_auth_oauthlib.flow import InstalledAppFlow
     
     try:
-        from token_storage import get_user_token, save_user_token
+        from token_storage import get_user_token
     except ImportError:
         logger.warning("token_storage module not available, persistence disabled")
         get_user_token = lambda username, service: None
-        save_user_token = lambda username, service, token: False
     
     logger.info(f"Getting Google {service_name} service")
     
@@ -78,42 +277,45 @@ def get_google_service(service_name):
         creds = st.session_state[cred_key]
         
         # Check if credentials are expired and need refresh
-        if hasattr(creds, 'expired') and creds.expired and hasattr(creds, 'refresh_token'):
-            try:
-                logger.info(f"Refreshing expired credentials for {service_name}")
-                creds.refresh(Request())
+        try:
+            # Save refreshed token back to database if user is logged in
+            username = (st.session_state.get("user") or {}).get("username")
+            if _refresh_credentials(creds, username, f"google_{service_name}"):
+                logger.info(f"Refreshed expired credentials for {service_name}")
                 st.session_state[cred_key] = creds
-                
-                # Save refreshed token back to database if user is logged in
-                if "user" in st.session_state and st.session_state.user:
-                    username = st.session_state.user.get("username")
-                    if username:
-                        creds_dict = {
-                            'token': creds.token,
-                            'refresh_token': creds.refresh_token,
-                            'token_uri': creds.token_uri,
-                            'client_id': creds.client_id,
-                            'client_secret': creds.client_secret,
-                            'scopes': creds.scopes
-                        }
-                        save_user_token(username, f"google_{service_name}", creds_dict)
-            except Exception as e:
-                logger.error(f"Failed to refresh credentials: {e}")
-                # Continue to next auth method - don't delete the credentials yet
-                pass
+        except Exception as e:
+            logger.error(f"Failed to refresh credentials: {e}")
+            # Continue to next auth method - don't delete the credentials yet
         
-        # Try to build service with existing credentials
-        if not hasattr(creds, 'expired') or not creds.expired:
+        # Try to build service with existing credentials (valid = has a token that is not expired)
+        if creds.valid:
             try:
-                api_version = 'v3' if service_name == 'drive' else 'v1'
-                service = build(service_name, api_version, credentials=creds)
+                service = _session_service(service_name, creds)
                 logger.info(f"Successfully built {service_name} service using session credentials")
                 return service
             except Exception as e:
                 logger.error(f"Error building {service_name} service with session credentials: {e}")
                 # Continue to next authentication method
     
-    # STEP 2: Check if user is logged in and has stored tokens
+    # STEP 2: One consent grants every scope in SCOPES, so credentials the session
+    # already holds for another Google service serve this one too
+    shared_creds = next(
+        (st.session_state[f"google_{other}_creds"] for other in API_VERSIONS
+         if other != service_name and st.session_state.get(f"google_{other}_creds")
+         and st.session_state[f"google_{other}_creds"].valid),
+        None
+    )
+    if shared_creds is not None:
+        try:
+            service = _session_service(service_name, shared_creds)
+            st.session_state[cred_key] = shared_creds
+            st.session_state[f"{service_name}_auth_complete"] = True
+            logger.info(f"Built {service_name} service with credentials shared from this session")
+            return service
+        except Exception as e:
+            logger.error(f"Error building {service_name} service with shared credentials: {e}")
+    
+    # STEP 3: Check if user is logged in and has stored tokens
     if "user" in st.session_state and st.session_state.user:
         username = st.session_state.user.get("username")
         if username:
@@ -123,30 +325,11 @@ def get_google_service(service_name):
             if saved_token:
                 try:
                     # Create credentials from saved token
-                    creds = Credentials(
-                        token=saved_token.get('token'),
-                        refresh_token=saved_token.get('refresh_token'),
-                        token_uri=saved_token.get('token_uri'),
-                        client_id=saved_token.get('client_id'),
-                        client_secret=saved_token.get('client_secret'),
-                        scopes=saved_token.get('scopes')
-                    )
+                    creds = _credentials_from_dict(saved_token)
                     
-                    # Check if credentials are expired and need refresh
-                    if hasattr(creds, 'expired') and creds.expired and hasattr(creds, 'refresh_token'):
-                        logger.info(f"Refreshing expired credentials from database for {service_name}")
-                        creds.refresh(Request())
-                        
-                        # Save refreshed token back to database
-                        creds_dict = {
-                            'token': creds.token,
-                            'refresh_token': creds.refresh_token,
-                            'token_uri': creds.token_uri,
-                            'client_id': creds.client_id,
-                            'client_secret': creds.client_secret,
-                            'scopes': creds.scopes
-                        }
-                        save_user_token(username, f"google_{service_name}", creds_dict)
+                    # Refresh expired credentials and save the new token back to database
+                    if _refresh_credentials(creds, username, f"google_{service_name}"):
+                        logger.info(f"Refreshed expired credentials from database for {service_name}")
                     
                     # Store in session state for convenience
                     st.session_state[cred_key] = creds
@@ -157,31 +340,26 @@ def get_google_service(service_name):
                         st.session_state["google_auth_complete"] = True
                     
                     # Build service
-                    api_version = 'v3' if service_name == 'drive' else 'v1'
-                    service = build(service_name, api_version, credentials=creds)
+                    service = _session_service(service_name, creds)
                     logger.info(f"Successfully built {service_name} service using saved credentials")
                     return service
                 except Exception as e:
                     logger.error(f"Error using saved token from database: {e}")
                     # Continue to OAuth flow
     
-    # STEP 3: If we need to authenticate, set up the OAuth flow
+    # STEP 4: If we need to authenticate, set up the OAuth flow
     try:
-        # Load client config from Streamlit secrets
-        client_config_str = st.secrets["gcp"]["client_config"]
-        if not client_config_str:
-            logger.error("Google API client config not found in secrets")
-            st.error("Google API credentials are missing. Please check your configuration.")
-            return None
+        # Reruns while the user is away at Google reuse the link (and its CSRF state)
+        # built on the first pass instead of constructing a new flow each time
+        auth_url = st.session_state.get("oauth_auth_url")
+        if not auth_url or st.session_state.get("authenticating_service") != service_name:
+            # Load client config from Streamlit secrets
+            client_config = get_google_credentials()
+            if not client_config:
+                logger.error("Google API client config not found in secrets")
+                st.error("Google API credentials are missing. Please check your configuration.")
+                return None
             
-        client_config = json.loads(client_config_str)
-        
-        # Create a temporary file for credentials
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.json', mode='w') as temp:
-            json.dump(client_config, temp)
-            temp_path = temp.name
-        
-        try:
             # Generate a state token to prevent CSRF
             state = str(uuid.uuid4())
             st.session_state["oauth_state"] = state
@@ -190,91 +368,77 @@ def get_google_service(service_name):
             st.session_state["authenticating_service"] = service_name
             
             # Use a consistent redirect URI
-            redirect_uri = "https://prezlab-tms.streamlit.app/"
-            logger.info(f"Using redirect URI: {redirect_uri}")
-            
-            flow = InstalledAppFlow.from_client_secrets_file(
-                temp_path, 
-                SCOPES,
-                redirect_uri=redirect_uri
-            )
-            
-            # Generate authorization URL with state parameter
-            auth_url, _ = flow.authorization_url(
-                prompt='consent', 
-                access_type='offline',
-                state=state,
-                include_granted_scopes='true'
-            )
-            
-            # Prompt user to authenticate
-            st.info(f"### Google Authentication Required")
-            st.markdown(f"[Click here to authenticate with Google {service_name.capitalize()}]({auth_url})")
+            logger.info(f"Using redirect URI: {OAUTH_REDIRECT_URI}")
             
-            # Add a cancel button
-            if st.button("Cancel Authentication"):
-                if "authenticating_service" in st.session_state:
-                    del st.session_state["authenticating_service"]
-                st.rerun()
-            
-            # Stop execution to wait for redirect
-            st.stop()
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_path)
-            except Exception as e:
-                logger.warning(f"Failed to delete temporary file: {e}")
+            # Generate authorization URL with state parameter; the flow itself is
+            # only needed once Google redirects back with a code
+            client_info = client_config.get("web") or client_config["installed"]
+            auth_url = _auth_url_base(
+                client_info["client_id"],
+                client_info.get("auth_uri", "https://accounts.google.com/o/oauth2/auth"),
+                OAUTH_REDIRECT_URI
+            ) + "&" + urlencode({'state': state})
+            st.session_state["oauth_auth_url"] = auth_url
+        
+        # Prompt user to authenticate
+        st.info(f"### Google Authentication Required")
+        st.markdown(f"[Click here to authenticate with Google {service_name.capitalize()}]({auth_url})")
+        
+        # Add a cancel button
+        if st.button("Cancel Authentication"):
+            if "authenticating_service" in st.session_state:
+                del st.session_state["authenticating_service"]
+            st.session_state.pop("oauth_auth_url", None)
+            st.rerun()
+        
+        # Stop execution to wait for redirect
+        st.stop()
     except Exception as e:
         logger.error(f"Google Authentication Error: {e}", exc_info=True)
         st.error(f"Failed to authenticate with Google: {str(e)}")
     
     return None
 
+def _exchange_oauth_code(code):
+    """
+    Exchanges an OAuth authorization code for credentials and stores them
+    in session state for both Gmail and Drive.
+    
+    Args:
+        code: Authorization code from the OAuth redirect
+        
+    Returns:
+        Credentials object
+    """
+    flow = InstalledAppFlow.from_client_config(
+        get_google_credentials(), 
+        SCOPES,
+        redirect_uri=OAUTH_REDIRECT_URI
+    )
+    
+    # Exchange code for tokens over the pooled token-endpoint connections
+    flow.oauth2session.mount("https://", _token_http.get_adapter("https://"))
+    flow.fetch_token(code=code)
+    creds = flow.credentials
+    
+    # Store credentials for both services to avoid multiple auth
+    st.session_state.pop("oauth_auth_url", None)
+    st.session_state["google_gmail_creds"] = creds
+    st.session_state["google_drive_creds"] = creds
+    
+    # Set all auth flags
+    st.session_state["gmail_auth_complete"] = True
+    st.session_state["drive_auth_complete"] = True
+    st.session_state["google_auth_complete"] = True
+    return creds
+
 def process_oauth_callback(code):
     """Process OAuth callback code without disrupting session state"""
     try:
         print(f"Processing OAuth code: {code[:10]}..." if len(code) > 10 else code)
-        
-        # Load client config from Streamlit secrets
-        client_config_str = st.secrets["gcp"]["client_config"]
-        client_config = json.loads(client_config_str)
-        
-        # Create a temporary file for credentials
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.json', mode='w') as temp:
-            json.dump(client_config, temp)
-            temp_path = temp.name
-        
-        try:
-            # Consistent redirect URI
-            redirect_uri = "https://prezlab-tms.streamlit.app/"
-            flow = InstalledAppFlow.from_client_secrets_file(
-                temp_path, 
-                SCOPES,
-                redirect_uri=redirect_uri
-            )
-            
-            # Exchange code for token
-            flow.fetch_token(code=code)
-            creds = flow.credentials
-            
-            # Store credentials for both services to avoid multiple auth
-            st.session_state["google_gmail_creds"] = creds
-            st.session_state["google_drive_creds"] = creds
-            
-            # Set all auth flags
-            st.session_state["gmail_auth_complete"] = True
-            st.session_state["drive_auth_complete"] = True
-            st.session_state["google_auth_complete"] = True
-            
-            print("Authentication successful for all Google services!")
-            return True
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
+        _exchange_oauth_code(code)
+        print("Authentication successful for all Google services!")
+        return True
     except Exception as e:
         print(f"Error processing OAuth code: {e}")
         return False
@@ -285,78 +449,39 @@ def handle_oauth_callback(code):
     """Process Google OAuth callback code with simplified approach"""
     try:
         logger.info(f"Processing OAuth code")
+        creds = _exchange_oauth_code(code)
         
-        # Load client config
-        client_config_str = st.secrets["gcp"]["client_config"]
-        client_config = json.loads(client_config_str)
-        
-        # Create a temporary file for credentials
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.json', mode='w') as temp:
-            json.dump(client_config, temp)
-            temp_path = temp.name
-        
+        # Import and save to Supabase
+        print("SAVING TOKEN TO SUPABASE - DIRECT TEST")
         try:
-            # Use the same URI that was used to initiate the flow
-            redirect_uri = "https://prezlab-tms.streamlit.app/"
-            
-            flow = InstalledAppFlow.from_client_secrets_file(
-                temp_path, 
-                SCOPES,
-                redirect_uri=redirect_uri
-            )
+            from token_storage import save_user_token
             
-            # Exchange code for tokens
-            flow.fetch_token(code=code)
-            creds = flow.credentials
-            
-            # Store credentials in session state for both services
-            st.session_state["google_gmail_creds"] = creds
-            st.session_state["google_drive_creds"] = creds
-            
-            # Import and save to Supabase
-            print("SAVING TOKEN TO SUPABASE - DIRECT TEST")
-            try:
-                from token_storage import save_user_token
-                
-                if "user" in st.session_state and st.session_state.user:
-                    username = st.session_state.user.get("username")
-                    if username:
-                        # Convert credentials to serializable format
-                        creds_dict = {
-                            'token': creds.token,
-                            'refresh_token': creds.refresh_token,
-                            'token_uri': creds.token_uri,
-                            'client_id': creds.client_id,
-                            'client_secret': creds.client_secret,
-                            'scopes': creds.scopes
-                        }
-                        
-                        # Direct save attempt - add custom print statements
-                        print(f"Token saving attempt for {username}/google_gmail")
-                        result = save_user_token(username, "google_gmail", creds_dict)
-                        print(f"Save result: {result}")
-                        
-                        # Also save for Drive
-                        print(f"Token saving attempt for {username}/google_drive")
-                        result = save_user_token(username, "google_drive", creds_dict)
-                        print(f"Save result: {result}")
-                    else:
-                        print("ERROR: Username not found in session state")
+            if "user" in st.session_state and st.session_state.user:
+                username = st.session_state.user.get("username")
+                if username:
+                    # Convert credentials to serializable format
+                    creds_dict = _credentials_to_dict(creds)
+                    
+                    # Direct save attempt - add custom print statements
+                    print(f"Token saving attempt for {username}/google_gmail")
+                    result = save_user_token(username, "google_gmail", creds_dict)
+                    print(f"Save result: {result}")
+                    
+                    # Also save for Drive
+                    print(f"Token saving attempt for {username}/google_drive")
+                    result = save_user_token(username, "google_drive", creds_dict)
+                    print(f"Save result: {result}")
                 else:
-                    print("ERROR: User information not found in session state")
-            except Exception as e:
-                print(f"ERROR saving token: {str(e)}")
-                import traceback
-                print(traceback.format_exc())
-            
-            logger.info("Google authentication successful")
-            return True
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_path)
-            except Exception as e:
-                logger.warning(f"Failed to delete temporary file: {e}")
+                    print("ERROR: Username not found in session state")
+            else:
+                print("ERROR: User information not found in session state")
+        except Exception as e:
+            print(f"ERROR saving token: {str(e)}")
+            import traceback
+            print(traceback.format_exc())
+        
+        logger.info("Google authentication successful")
+        return True
     except Exception as e:
         logger.error(f"Error handling OAuth callback: {e}", exc_info=True)
         return False
@@ -389,32 +514,10 @@ def auto_authenticate_google_services():
         gmail_token = get_user_token(username, "google_gmail")
         if gmail_token:
             try:
-                from google.oauth2.credentials import Credentials
-                creds = Credentials(
-                    token=gmail_token.get('token'),
-                    refresh_token=gmail_token.get('refresh_token'),
-                    token_uri=gmail_token.get('token_uri'),
-                    client_id=gmail_token.get('client_id'),
-                    client_secret=gmail_token.get('client_secret'),
-                    scopes=gmail_token.get('scopes')
-                )
+                creds = _credentials_from_dict(gmail_token)
                 
-                # Check if expired and refresh if needed
-                if hasattr(creds, 'expired') and creds.expired and hasattr(creds, 'refresh_token'):
-                    from google.auth.transport.requests import Request
-                    creds.refresh(Request())
-                    
-                    # Save refreshed token
-                    from token_storage import save_user_token
-                    creds_dict = {
-                        'token': creds.token,
-                        'refresh_token': creds.refresh_token,
-                        'token_uri': creds.token_uri,
-                        'client_id': creds.client_id,
-                        'client_secret': creds.client_secret,
-                        'scopes': creds.scopes
-                    }
-                    save_user_token(username, "google_gmail", creds_dict)
+                # Refresh if expired and save the new token
+                _refresh_credentials(creds, username, "google_gmail")
                 
                 # Store in session state
                 st.session_state["google_gmail_creds"] = creds
@@ -429,32 +532,16 @@ def auto_authenticate_google_services():
         drive_token = get_user_token(username, "google_drive")
         if drive_token:
             try:
-                from google.oauth2.credentials import Credentials
-                creds = Credentials(
-                    token=drive_token.get('token'),
-                    refresh_token=drive_token.get('refresh_token'),
-                    token_uri=drive_token.get('token_uri'),
-                    client_id=drive_token.get('client_id'),
-                    client_secret=drive_token.get('client_secret'),
-                    scopes=drive_token.get('scopes')
-                )
+                # Both rows normally hold the same grant; reuse the Gmail object so
+                # the session keeps (and refreshes) a single set of credentials
+                gmail_creds = st.session_state.get("google_gmail_creds") if gmail_success else None
+                if gmail_creds is not None and gmail_creds.refresh_token == drive_token.get("refresh_token"):
+                    creds = gmail_creds
+                else:
+                    creds = _credentials_from_dict(drive_token)
                 
-                # Check if expired and refresh if needed
-                if hasattr(creds, 'expired') and creds.expired and hasattr(creds, 'refresh_token'):
-                    from google.auth.transport.requests import Request
-                    creds.refresh(Request())
-                    
-                    # Save refreshed token
-                    from token_storage import save_user_token
-                    creds_dict = {
-                        'token': creds.token,
-                        'refresh_token': creds.refresh_token,
-                        'token_uri': creds.token_uri,
-                        'client_id': creds.client_id,
-                        'client_secret': creds.client_secret,
-                        'scopes': creds.scopes
-                    }
-                    save_user_token(username, "google_drive", creds_dict)
+                # Refresh if expired and save the new token
+                _refresh_credentials(creds, username, "google_drive")
                 
                 # Store in session state
                 st.session_state["google_drive_creds"] = creds
@@ -1,7 +1,6 @@
 import logging
 import streamlit as st
 from googleapiclient.errors import HttpError
-from googleapiclient.discovery import build
 from config import get_secret
 
 # Configure logging
@@ -19,12 +18,7 @@ def get_drive_service():
     """Get an authenticated Drive service"""
     from google_auth import get_google_service
     
-    # Check if we already have Drive credentials
-    if "google_drive_creds" in st.session_state:
-        # Use existing Drive credentials
-        return build('drive', 'v3', credentials=st.session_state.google_drive_creds)
-    
-    # Get service through standard flow
+    # Session credentials, refresh and the built client are all handled (and cached) there
     return get_google_service('drive')
 
 def create_folder(folder_name, parent_folder_id=None):
@@ -268,6 +268,33 @@ def get_sales_order_details(models: xmlrpc.client.ServerProxy, uid: int, sales_o
         st.error(f"Error retrieving sales order details: {e}")
         return {}
 
+def fetch_employee_schedule(models: xmlrpc.client.ServerProxy, db: str, uid: int,
+                            password: str, employee_id: int) -> List[OdooRecord]:
+    """
+    Reads the schedule for a specific employee, raising on Odoo errors.
+    
+    Takes the database and password explicitly so it can run outside the
+    Streamlit script thread, where st.session_state is not available.
+    
+    Args:
+        models: Odoo models proxy
+        db: Odoo database name
+        uid: User ID
+        password: Odoo password
+        employee_id: Employee ID
+        
+    Returns:
+        List of schedule records
+    """
+    tasks = models.execute_kw(
+        db, uid, password,
+        'planning.slot', 'search_read',
+        [[['resource_id', '=', employee_id]]],
+        {'fields': ['start_datetime', 'end_datetime'], 'order': 'start_datetime'}
+    )
+    logger.info(f"Retrieved {len(tasks)} scheduled tasks for employee {employee_id}")
+    return tasks
+
 def get_employee_schedule(models: xmlrpc.client.ServerProxy, uid: int, employee_id: int) -> List[OdooRecord]:
     """
     Retrieves the schedule for a specific employee.
@@ -281,14 +308,10 @@ def get_employee_schedule(models: xmlrpc.client.ServerProxy, uid: int, employee_
         List of schedule records
     """
     try:
-        tasks = models.execute_kw(
-            st.session_state.odoo_credentials['db'], uid, st.session_state.odoo_credentials['password'],
-            'planning.slot', 'search_read',
-            [[['resource_id', '=', employee_id]]],
-            {'fields': ['start_datetime', 'end_datetime'], 'order': 'start_datetime'}
+        return fetch_employee_schedule(
+            models, st.session_state.odoo_credentials['db'], uid,
+            st.session_state.odoo_credentials['password'], employee_id
         )
-        logger.info(f"Retrieved {len(tasks)} scheduled tasks for employee {employee_id}")
-        return tasks
         
     except Exception as e:
         logger.error(f"Error fetching employee schedule: {e}", exc_info=True)
@@ -1,22 +1,25 @@
 # token_storage.py
-import json, logging, streamlit as st, base64, os, time, traceback
+import json, logging, streamlit as st, base64, os, time, traceback, threading
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
 from cryptography.fernet import Fernet
 
 # ➜  NEW – pull the central helper instead of defining our own
 from config import get_secret
 
-# Configure logging with more details
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    filename='token_storage.log'
-)
+# Configure logging with more details: a size-capped file plus the console for easier
+# debugging, attached once so module reloads do not write every line several times
 logger = logging.getLogger(__name__)
-
-# Add console handler for easier debugging
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-logger.addHandler(console_handler)
+if not logger.handlers:
+    _log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    _file_handler = RotatingFileHandler('token_storage.log', maxBytes=1_000_000, backupCount=3, delay=True)
+    _file_handler.setFormatter(_log_formatter)
+    logger.addHandler(_file_handler)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    logger.addHandler(console_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
 
 # def get_secret(key, default=None):
 #     """Improved secret access with debug output"""
@@ -134,6 +137,63 @@ def decrypt_token(encrypted_token):
         logger.error(f"Error decrypting token: {e}")
         return None
 
+def _session_token_cache():
+    """Decrypted tokens already loaded or saved in this session, keyed by (username, service).
+    Kept in session_state rather than st.cache_data so tokens never leak across users."""
+    return st.session_state.setdefault("_oauth_token_cache", {})
+
+# Seconds a "no token stored" lookup is trusted before Supabase is queried again. Kept
+# short because the OAuth callback usually saves the token from another tab's session.
+TOKEN_MISS_TTL = 5
+
+def _session_token_misses():
+    """Monotonic time of the last lookup in this session that found no token, keyed by (username, service)"""
+    return st.session_state.setdefault("_oauth_token_misses", {})
+
+def _write_token(supabase, username, service, encrypted_token):
+    """Insert or update the encrypted token row; returns True on success"""
+    # Check if token already exists
+    try:
+        response = supabase.table("oauth_tokens").select("*").eq("username", username).eq("service", service).execute()
+        
+        if hasattr(response, 'error') and response.error:
+            logger.error(f"Query error: {response.error.message}")
+            return False
+            
+        logger.info(f"Query result: Found {len(response.data)} existing records")
+        
+        if response.data:
+            # Update existing record
+            logger.info(f"Updating existing token for {username}/{service}")
+            result = supabase.table("oauth_tokens").update({"token": encrypted_token}).eq("username", username).eq("service", service).execute()
+            
+            if hasattr(result, 'error') and result.error:
+                logger.error(f"Update error: {result.error.message}")
+                return False
+                
+            logger.info(f"Update successful: {len(result.data)} records affected")
+        else:
+            # Insert new record
+            logger.info(f"Inserting new token for {username}/{service}")
+            result = supabase.table("oauth_tokens").insert({
+                "username": username,
+                "service": service,
+                "token": encrypted_token
+            }).execute()
+            
+            if hasattr(result, 'error') and result.error:
+                logger.error(f"Insert error: {result.error.message}")
+                return False
+                
+            logger.info(f"Insert successful: {len(result.data)} records created")
+        
+        logger.info(f"Saved {service} token for user {username}")
+        return True
+    except Exception as e:
+        logger.error(f"Error in Supabase operation: {e}")
+        logger.error(traceback.format_exc())
+        return False
+
 def save_user_token(username, service, token_data):
     """Save a user's OAuth token with comprehensive error handling"""
     try:
@@ -157,52 +217,69 @@ def save_user_token(username, service, token_data):
             
         logger.info("Token encrypted successfully")
         
-        # Check if token already exists
-        try:
-            response = supabase.table("oauth_tokens").select("*").eq("username", username).eq("service", service).execute()
-            
-            if hasattr(response, 'error') and response.error:
-                logger.error(f"Query error: {response.error.message}")
-                return False
-                
-            logger.info(f"Query result: Found {len(response.data)} existing records")
-            
-            if response.data:
-                # Update existing record
-                logger.info(f"Updating existing token for {username}/{service}")
-                result = supabase.table("oauth_tokens").update({"token": encrypted_token}).eq("username", username).eq("service", service).execute()
-                
-                if hasattr(result, 'error') and result.error:
-                    logger.error(f"Update error: {result.error.message}")
-                    return False
-                    
-                logger.info(f"Update successful: {len(result.data)} records affected")
-            else:
-                # Insert new record
-                logger.info(f"Inserting new token for {username}/{service}")
-                result = supabase.table("oauth_tokens").insert({
-                    "username": username,
-                    "service": service,
-                    "token": encrypted_token
-                }).execute()
-                
-                if hasattr(result, 'error') and result.error:
-                    logger.error(f"Insert error: {result.error.message}")
-                    return False
-                    
-                logger.info(f"Insert successful: {len(result.data)} records created")
-            
-            logger.info(f"Saved {service} token for user {username}")
-            return True
-        except Exception as e:
-            logger.error(f"Error in Supabase operation: {e}")
-            logger.error(traceback.format_exc())
+        if not _write_token(supabase, username, service, encrypted_token):
             return False
+        _session_token_cache()[(username, service)] = token_data
+        return True
     except Exception as e:
         logger.error(f"Error in save_user_token: {e}")
         logger.error(traceback.format_exc())
         return False
 
+# Background writer for refreshed tokens, so the Supabase round-trip stays off the rerun.
+# Saves queued for the same (username, service) before the writer gets to them collapse
+# into one write of the newest token.
+_save_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="token-save")
+_pending_saves = {}
+_pending_lock = threading.Lock()
+
+def _flush_pending_save(supabase, key):
+    """Writes the newest queued token for key (runs on the background writer)"""
+    with _pending_lock:
+        encrypted_token = _pending_saves.pop(key, None)
+    if encrypted_token and not _write_token(supabase, key[0], key[1], encrypted_token):
+        logger.error(f"Background save of {key[1]} token for {key[0]} failed")
+
+def save_user_token_async(username, service, token_data):
+    """
+    Queue a user's OAuth token to be saved to Supabase in the background.
+    
+    The session cache is updated immediately, so later reads in this session
+    see the new token without waiting for the write.
+    
+    Args:
+        username: Logged-in username
+        service: Token service key, e.g. 'google_gmail'
+        token_data: Token document to store
+        
+    Returns:
+        True if the save was queued, False if it could not be
+    """
+    if not username or not service:
+        logger.error(f"Invalid parameters: username={username}, service={service}")
+        return False
+    
+    # Resolve the client and encrypt here: the writer thread has no Streamlit context
+    supabase = get_supabase_client()
+    if not supabase:
+        logger.error("Failed to initialize Supabase client")
+        return False
+    
+    encrypted_token = encrypt_token(token_data)
+    if not encrypted_token:
+        logger.error("Failed to encrypt token data")
+        return False
+    
+    _session_token_cache()[(username, service)] = token_data
+    
+    key = (username, service)
+    with _pending_lock:
+        already_queued = key in _pending_saves
+        _pending_saves[key] = encrypted_token
+    if not already_queued:
+        _save_executor.submit(_flush_pending_save, supabase, key)
+    return True
+
 def get_user_token(username, service):
     """Retrieve a user's OAuth token with better error handling"""
     try:
@@ -211,6 +288,16 @@ def get_user_token(username, service):
         if not username or not service:
             logger.error(f"Invalid parameters: username={username}, service={service}")
             return None
+        
+        cache = _session_token_cache()
+        if (username, service) in cache:
+            logger.info("Using token cached in session")
+            return cache[(username, service)]
+        
+        misses = _session_token_misses()
+        if time.monotonic() - misses.get((username, service), float("-inf")) < TOKEN_MISS_TTL:
+            logger.info(f"No token found for {username}/{service} (checked moments ago)")
+            return None
             
         supabase = get_supabase_client()
         if not supabase:
@@ -230,12 +317,14 @@ def get_user_token(username, service):
             token_data = decrypt_token(encrypted_token)
             if token_data:
                 logger.info(f"Successfully retrieved and decrypted token")
+                cache[(username, service)] = token_data
                 return token_data
             else:
                 logger.error("Failed to decrypt token")
                 return None
         else:
             logger.info(f"No token found for {username}/{service}")
+            misses[(username, service)] = time.monotonic()
             return None
     except Exception as e:
         logger.error(f"Error in get_user_token: {e}")
@@ -321,6 +410,8 @@ def reset_user_tokens():
             return False
             
         logger.info(f"Successfully reset tokens. Affected rows: {len(result.data)}")
+        _session_token_cache().clear()
+        _session_token_misses().clear()
         return True
     except Exception as e:
         logger.error(f"Error resetting tokens: {e}")